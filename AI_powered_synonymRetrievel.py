@@ -1,21 +1,81 @@
+import os
 import sqlite3
 import re
-import spacy
-from transformers import AutoTokenizer, AutoModelForMaskedLM, AutoModelForSequenceClassification
-import torch
+import hashlib
+import threading
 import time
-from sentence_transformers import SentenceTransformer, util
-start_time = time.time()
-# Load multilingual SimCSE model
-simcse_model = SentenceTransformer("paraphrase-xlm-r-multilingual-v1")
-# Load SpaCy Dutch language model for lemmatization
-nlp = spacy.load("nl_core_news_lg")
-stopwords = nlp.Defaults.stop_words  # Set of Dutch stopwords from SpaCy
-# Load tokenizer and models
-tokenizer = AutoTokenizer.from_pretrained("wietsedv/bert-base-dutch-cased")
-mask_model = AutoModelForMaskedLM.from_pretrained("wietsedv/bert-base-dutch-cased")
-similarity_model = AutoModelForSequenceClassification.from_pretrained("DTAI-KULeuven/robbert-2023-dutch-base")
-similarity_tokenizer = AutoTokenizer.from_pretrained("DTAI-KULeuven/robbert-2023-dutch-base")
+from collections import OrderedDict, namedtuple
+from lexiconCache import get_lexicon, file_signature
+from getSynonymsDB import synonym_table, fetch_word_entries
+from connectionPool import get_pool
+from candidateRecords import Candidate, encode_candidate, encode_candidates, decode_candidates
+from modelRegistry import registry, SPACY_MODEL, MLM_MODEL, SIMCSE_MODEL
+from candidateCache import open_candidate_cache, context_key
+import inferenceBackend
+
+# The models are declared in modelRegistry and loaded on first use, so importing this module stays cheap
+
+MLM_TOP_K = 5  # Predictions per masked word
+MLM_BATCH_SIZE = 16  # Masked copies of a segment per forward pass
+MLM_MAX_LENGTH = 512  # Model tokens per masked copy
+MLM_MAX_LOGITS_MB = 256  # Logits per forward pass of a model that only returns the logits of all tokens (ONNX); peak memory is about twice this
+SIMCSE_BATCH_SIZE = 32  # Sentences per SimCSE encode batch
+MAX_CACHED_EMBEDDINGS = 10000  # Sentence embeddings kept across requests
+SIMPLICITY_WEIGHT = 0.5  # Weight of the simplicity gain when ranking replacements
+RELATEDNESS_WEIGHT = 0.5  # Weight of the relatedness (or similarity) score when ranking replacements
+CONTEXT_WINDOW = None  # Model input per word: None (the whole segment), 'sentence', or N words on each side
+
+# Counters exposed through get_metrics()
+metrics = {'spacy_calls': 0, 'segments': 0, 'last_segment_spacy_calls': 0,
+           'embedding_cache_hits': 0, 'embedding_cache_misses': 0}
+metrics_lock = threading.Lock()
+# SpaCy parses of the current thread, so a request counts its own parses and not those of concurrent requests
+thread_counters = threading.local()
+
+def count_metric(name, amount=1):
+    with metrics_lock:
+        metrics[name] += amount
+
+def get_metrics():
+    """
+    :return: Copy of the counters, with the average number of SpaCy parses per segment.
+    """
+    with metrics_lock:
+        result = dict(metrics)
+    result['spacy_calls_per_segment'] = result['spacy_calls'] / result['segments'] if result['segments'] else 0.0
+    if candidate_cache is not None:
+        result.update({f'candidate_cache_{name}': value for name, value in candidate_cache.stats().items()})
+    return result
+
+def get_simcse_model():
+    # Loaded with the inference backend selected at startup (see inferenceBackend)
+    return registry.get('simcse')
+
+def get_nlp():
+    return registry.get('spacy')
+
+stopwords = None
+
+def get_stopwords():
+    # Set of Dutch stopwords from SpaCy (the same set as nlp.Defaults.stop_words, without loading the model)
+    global stopwords
+    if stopwords is None:
+        from spacy.lang.nl.stop_words import STOP_WORDS
+        stopwords = STOP_WORDS
+    return stopwords
+
+def get_mask_model():
+    """
+    :return: Tokenizer and masked language model used to generate candidates, loaded with the
+             inference backend selected at startup (see inferenceBackend).
+    """
+    return registry.get('bertje_mlm')
+
+def get_similarity_model():
+    """
+    :return: Tokenizer and sequence classification model used to score sentence similarity.
+    """
+    return registry.get('robbert')
 
 # Database connection functions
 def open_database(db_path):
@@ -30,82 +90,278 @@ def fetch_words(cursor):
     cursor.execute('SELECT word FROM words')
     return cursor.fetchall()
 
-def fetch_synonyms(cursor, word):
-    cursor.execute('SELECT synonym FROM synonyms WHERE word = ?', (word,))
-    return cursor.fetchall()
-
 def fetch_word_simplicity_score(cursor, word):
     cursor.execute("SELECT simplicity_score FROM words WHERE word = ?", (word,))
     result = cursor.fetchone()
     return result[0] if result else None
 
+def lookup_simplicity_score(cursor, word, lexicon=None):
+    # Served from the shared in-memory lexicon when one is given
+    if lexicon is not None:
+        return lexicon.simplicity_score(word)
+    return fetch_word_simplicity_score(cursor, word)
+
+def fetch_forms(cursor, forms, chunk_size=900):
+    """
+    Look up the lemmas and POS tags of surface forms in the precomputed forms table.
+    :param cursor: SQLite cursor.
+    :param forms: Iterable of lowercased forms.
+    :param chunk_size: Number of forms per IN (...) query, below SQLite's variable limit.
+    :return: Dictionary form -> (lemma, pos) for the forms found (empty if the database has no forms table).
+    """
+    forms = list(set(forms))
+    analyses = {}
+    try:
+        for i in range(0, len(forms), chunk_size):
+            chunk = forms[i:i + chunk_size]
+            cursor.execute(f"SELECT form, lemma, pos FROM forms WHERE form IN ({', '.join('?' * len(chunk))})", chunk)
+            analyses.update((form, (lemma, pos)) for form, lemma, pos in cursor.fetchall())
+    except sqlite3.OperationalError:
+        return {}
+    return analyses
+
+def fetch_lemmas(cursor, forms, chunk_size=900):
+    """
+    Look up the lemmas of surface forms in the precomputed forms table.
+    :return: Dictionary form -> lemma for the forms found (empty if the database has no forms table).
+    """
+    return {form: lemma for form, (lemma, _) in fetch_forms(cursor, forms, chunk_size).items()}
+
+def parse(text):
+    # Every SpaCy parse goes through here, so it is counted
+    count_metric('spacy_calls')
+    thread_counters.spacy_calls = getattr(thread_counters, 'spacy_calls', 0) + 1
+    return get_nlp()(text)
+
+# One row per \w+ word of a segment; start and end are character offsets in the segment
+TokenRow = namedtuple('TokenRow', ['position', 'text', 'lemma', 'pos', 'start', 'end'])
+
+def parse_segment(segment, cursor=None):
+    """
+    Parse a segment once with SpaCy into a token table.
+    Lemmas and POS tags come from the parse, in context. The forms table (when a cursor is given)
+    is only used for the lemmas of words that do not line up with a SpaCy token.
+    :param segment: Text to parse.
+    :param cursor: Optional SQLite cursor for the forms table lookup.
+    :return: Tuple (doc, rows): the SpaCy Doc and a TokenRow per \w+ word, in order.
+    """
+    doc = parse(segment)
+    tokens = []
+    for match in re.finditer(r'\w+', segment):
+        span = doc.char_span(match.start(), match.end(), alignment_mode='expand')
+        tokens.append((match, span[0] if span is not None and len(span) else None))
+    unaligned = [match.group().lower() for match, token in tokens
+                 if token is None or token.text.lower() != match.group().lower()]
+    lemmas = fetch_lemmas(cursor, unaligned) if cursor is not None and unaligned else {}
+
+    rows = []
+    for position, (match, token) in enumerate(tokens):
+        form = match.group().lower()
+        if token is not None and token.text.lower() == form:
+            lemma = token.lemma_.lower()
+        else:
+            lemma = lemmas.get(form, form)
+        rows.append(TokenRow(position, match.group(), lemma, token.pos_ if token is not None else None,
+                             match.start(), match.end()))
+    return doc, rows
+
+# Lemma and POS of model candidates, by (context window, offset of the candidate in it)
+candidate_analyses = OrderedDict()
+candidate_analyses_lock = threading.Lock()
+MAX_CANDIDATE_ANALYSES = 10000
+CANDIDATE_CONTEXT_WORDS = 3  # Words on either side of a candidate that are parsed with it
+
+def analyze_candidate(candidate, candidate_sentence, start, cursor=None):
+    """
+    Find the lemma and POS of a candidate placed in a sentence, in context. Only a window of
+    CANDIDATE_CONTEXT_WORDS words on either side of the candidate is parsed, and the analyses are
+    cached by that window, so the same candidate in the same context is parsed once. The forms
+    table is only used when the candidate does not line up with a SpaCy token.
+    :param candidate: The candidate word.
+    :param candidate_sentence: Sentence with the candidate in place.
+    :param start: Character offset of the candidate in candidate_sentence.
+    :param cursor: Optional SQLite cursor for the forms table lookup.
+    :return: Tuple (lemma, pos); either can be None when unknown.
+    """
+    end = start + len(candidate)
+    before = [match.start() for match in re.finditer(r'\w+', candidate_sentence[:start])]
+    after = [match.end() for match in re.finditer(r'\w+', candidate_sentence[end:])]
+    window_start = before[-CANDIDATE_CONTEXT_WORDS] if len(before) > CANDIDATE_CONTEXT_WORDS else 0
+    window_end = end + after[CANDIDATE_CONTEXT_WORDS - 1] if len(after) > CANDIDATE_CONTEXT_WORDS else len(candidate_sentence)
+    window = candidate_sentence[window_start:window_end]
+    key = (window, start - window_start)
+    with candidate_analyses_lock:
+        if key in candidate_analyses:
+            candidate_analyses.move_to_end(key)
+            return candidate_analyses[key]
+
+    span = parse(window).char_span(start - window_start, end - window_start, alignment_mode='expand')
+    if span is not None and len(span):
+        analysis = (span[0].lemma_, span[0].pos_)
+    elif cursor is not None:
+        analysis = fetch_forms(cursor, [candidate.lower()]).get(candidate.lower(), (None, None))
+    else:
+        analysis = (None, None)
+    with candidate_analyses_lock:
+        candidate_analyses[key] = analysis
+        while len(candidate_analyses) > MAX_CANDIDATE_ANALYSES:
+            candidate_analyses.popitem(last=False)
+    return analysis
+
+def lemmatize_text(text, cursor):
+    """
+    Lemmatize every word of a text for database lookup.
+    Forms are looked up in the forms table; SpaCy only runs (over the whole text, for context) when
+    some forms are missing from it.
+    :param text: Text to lemmatize.
+    :param cursor: SQLite cursor.
+    :return: List with the lowercased lemma of every word (\w+) in the text.
+    """
+    words = re.findall(r'\w+', text.lower())
+    lemmas = fetch_lemmas(cursor, words)
+    missing = {word for word in words if word not in lemmas}
+    if missing:
+        for token in parse(text):
+            form = token.text.lower()
+            if form in missing:
+                lemmas[form] = token.lemma_.lower()
+                missing.discard(form)
+    return [lemmas.get(word, word) for word in words]
+
 # Extract word scores and synonyms from database using lemmatized text
-def extract_word_scores_and_synonyms(text, cursor,initial_word_count = 0, debug=False):
+def find_db_candidates(text, cursor, initial_word_count=0, debug=False, lexicon=None, lemmas=None):
+    """
+    Look up the database synonyms of every word in a text.
+    :param text: Text (segment) to find replacements for.
+    :param cursor: SQLite cursor.
+    :param initial_word_count: Position of the first word of the text in the full text.
+    :param debug: Print the words that are skipped.
+    :param lexicon: Optional shared lexicon serving the lookups.
+    :param lemmas: Lemmas of the words of the text, when they are already known (see parse_segment).
+    :return: Tuple (list of Candidate records, number of words in the text). A word without
+             synonyms gets a single record without synonym.
+    """
     # Lemmatize the text for database lookup
-    lemmatized_text = " ".join([token.lemma_ for token in nlp(text)])
-    words = re.findall(r'\w+', lemmatized_text.lower())
+    words = lemmas if lemmas is not None else lemmatize_text(text, cursor)
     word_positions = {index: word for index, word in enumerate(words)}
 
     result = []
-    db_words = {word[0] for word in fetch_words(cursor)}  # Convert list of tuples to set of words for fast lookup
+    # Words, synonyms and all their scores for the whole text in one batched lookup
+    if lexicon is not None:
+        entries = lexicon.entries(word_positions.values())
+    else:
+        entries = fetch_word_entries(cursor, word_positions.values(), synonym_table(cursor))
 
     for position, word in word_positions.items():
         position += initial_word_count
         # Fetch simplicity score for filtering
-        simplicity_score = fetch_word_simplicity_score(cursor, word)
+        complex_simplicity_score, synonyms = entries.get(word, (None, []))
         
         # Continue only if word is in the database and simplicity score is <= 10000
-        if word in db_words and simplicity_score is not None and simplicity_score <= 10000:
-            cursor.execute("SELECT simplicity_score FROM words WHERE word = ?", (word,))
-            complex_simplicity_score = cursor.fetchone()[0]
-            synonyms = fetch_synonyms(cursor, word)
-
+        if word in entries and complex_simplicity_score is not None and complex_simplicity_score <= 10000:
             if synonyms:
-                for synonym_tuple in synonyms:
-                    synonym = synonym_tuple[0]
-                    synonym_simplicity_score = fetch_word_simplicity_score(cursor, synonym)
-
+                for synonym, synonym_simplicity_score, relatedness_score in synonyms:
                     # Filter out synonyms with simplicity score > 10000
                     if synonym_simplicity_score is not None and synonym_simplicity_score <= 10000:
-                        cursor.execute("SELECT relatedness_score FROM synonyms WHERE word = ? AND synonym = ?", (word, synonym))
-                        relatedness_score = cursor.fetchone()[0]
-                        
-                        if debug:
-                            result.append(f"{word}|{position}|{complex_simplicity_score}|{synonym}|{synonym_simplicity_score}|{relatedness_score}")
-                        else:
-                            result.append(f"{position}|{complex_simplicity_score}|{synonym}|{synonym_simplicity_score}|{relatedness_score}")
+                        result.append(Candidate(position, word, complex_simplicity_score, synonym,
+                                                synonym_simplicity_score, relatedness_score, 'db'))
             else:
-                if debug:
-                    result.append(f"{word}|{position}|{complex_simplicity_score}|NONE|NONE|NONE")
-                else:
-                    result.append(f"{position}|{complex_simplicity_score}|NONE|NONE|NONE")
+                result.append(Candidate(position, word, complex_simplicity_score, source='db'))
         else:
             if debug:
                 print(f"Word '{word}' not found in the database or has simplicity score > 10000, skipping...")
             continue
-    return ";".join(result), len(words)
+    return result, len(words)
+
+def extract_word_scores_and_synonyms(text, cursor,initial_word_count = 0, debug=False, lexicon=None):
+    # Wire format of find_db_candidates: "position|simplicity_score|synonym|synonym_simplicity_score|relatedness_score"
+    # entries separated by ";", prefixed with "word|" when debug is True
+    candidates, word_count = find_db_candidates(text, cursor, initial_word_count, debug, lexicon)
+    return encode_candidates(candidates, debug), word_count
 
 # Helper function for context-based lemmatization
-def lemmatize_in_context(sentence, target_word):
+def lemmatize_in_context(sentence, target_word, cursor=None):
     """
-    Finds the lemma of target_word within the context of sentence using SpaCy.
+    Finds the lemma of target_word within the context of sentence, using the forms table when
+    a cursor is given and SpaCy otherwise.
     :param sentence: The full sentence in which target_word appears.
     :param target_word: The word to be lemmatized.
+    :param cursor: Optional SQLite cursor for the forms table lookup.
     :return: Lemma of the target word if found, otherwise None.
     """
-    doc = nlp(sentence)
+    if cursor is not None:
+        lemma = fetch_lemmas(cursor, [target_word.lower()]).get(target_word.lower())
+        if lemma is not None:
+            return lemma
+    doc = parse(sentence)
     for token in doc:
         if token.text == target_word:
             return token.lemma_
     return None
 
+# SimCSE embeddings by SHA-1 of the sentence, least recently used first
+embedding_cache = OrderedDict()
+embedding_cache_lock = threading.Lock()
+
+def encode_sentences(sentences, batch_size=SIMCSE_BATCH_SIZE):
+    """
+    Encode sentences with SimCSE, reusing cached embeddings. The sentences that are not cached are
+    encoded together in one batched call.
+    :param sentences: List of sentences.
+    :param batch_size: Sentences per forward pass of the model.
+    :return: NumPy array with one L2-normalised embedding per sentence.
+    """
+    import numpy as np
+    keys = [hashlib.sha1(sentence.encode('utf-8')).hexdigest() for sentence in sentences]
+    embeddings = {}
+    with embedding_cache_lock:
+        for key in keys:
+            if key in embedding_cache:
+                embedding_cache.move_to_end(key)
+                embeddings[key] = embedding_cache[key]
+    count_metric('embedding_cache_hits', len(keys) - sum(key not in embeddings for key in keys))
+
+    missing = {key: sentence for key, sentence in zip(keys, sentences) if key not in embeddings}
+    if missing:
+        count_metric('embedding_cache_misses', len(missing))
+        encoded = get_simcse_model().encode(list(missing.values()), batch_size=batch_size, convert_to_numpy=True)
+        encoded = encoded / np.maximum(np.linalg.norm(encoded, axis=1, keepdims=True), 1e-12)
+        with embedding_cache_lock:
+            for key, embedding in zip(missing, encoded):
+                embeddings[key] = embedding_cache[key] = embedding
+            while len(embedding_cache) > MAX_CACHED_EMBEDDINGS:
+                embedding_cache.popitem(last=False)
+    return np.stack([embeddings[key] for key in keys])
+
+def score_simcse_similarities(original_sentence, modified_sentences):
+    """
+    Cosine similarity between a sentence and each of its modified versions, computed as one
+    matrix-vector product over embeddings encoded in a single batch.
+    :return: List of similarity scores, in the order of modified_sentences.
+    """
+    if not modified_sentences:
+        return []
+    embeddings = encode_sentences([original_sentence] + list(modified_sentences))
+    return (embeddings[1:] @ embeddings[0]).tolist()
+
+def score_simcse_pairs(original_sentences, modified_sentences):
+    """
+    Cosine similarity of every (original, modified) pair, with all distinct sentences encoded in a single batch.
+    :return: List of similarity scores, one per pair.
+    """
+    if not modified_sentences:
+        return []
+    count = len(original_sentences)
+    embeddings = encode_sentences(list(original_sentences) + list(modified_sentences))
+    return (embeddings[:count] * embeddings[count:]).sum(axis=1).tolist()
+
 def check_simcse_similarity(original_sentence, modified_sentence):
-    embeddings = simcse_model.encode([original_sentence, modified_sentence])
-    similarity_score = util.cos_sim(embeddings[0], embeddings[1]).item()
-    return similarity_score
+    return score_simcse_similarities(original_sentence, [modified_sentence])[0]
 
 # Score sentence similarity
 def score_similarity(original_sentence, modified_sentence):
+    import torch
+    similarity_tokenizer, similarity_model = get_similarity_model()
     inputs = similarity_tokenizer([original_sentence, modified_sentence], return_tensors="pt", padding=True, truncation=True)
     with torch.no_grad():
         outputs = similarity_model(**inputs)
@@ -113,90 +369,153 @@ def score_similarity(original_sentence, modified_sentence):
     similarity_score = torch.softmax(logits, dim=1)[0][1].item()
     return similarity_score
 
-# Generate model-based synonym candidates in the same format as database suggestions
-def generate_candidates(sentence, word_to_replace, cursor, position, debug=False):
-    if debug:
-        print(f"\nGenerating candidates for '{word_to_replace}' at position {position}")
-    
+def select_target(sentence, word_to_replace, cursor, debug=False, lexicon=None, row=None):
+    """
+    Decide whether the model should look for replacements of a word.
+    :param sentence: Sentence (segment) containing the word.
+    :param word_to_replace: The word, or its lemma.
+    :param cursor: SQLite cursor.
+    :param debug: Print why the word is skipped.
+    :param lexicon: Optional shared lexicon serving the simplicity scores.
+    :param row: TokenRow of the word from parse_segment(sentence); without it the sentence is parsed here.
+    :return: Tuple (row, simplicity score of the lemma), or None when the word is skipped.
+    """
     # Skip stopwords
-    if word_to_replace in stopwords:
+    if word_to_replace in get_stopwords():
         if debug:
             print(f"Skipping '{word_to_replace}' as it is a stopword.")
-        return []
+        return None
 
-    # Lemmatize the word for database lookup using context-based lemmatization
-    lemmatized_word = lemmatize_in_context(sentence, word_to_replace)
-    if lemmatized_word is None:
+    # Lemma and POS of the word in context, from the token table of the sentence
+    if row is None:
+        _, rows = parse_segment(sentence, cursor)
+        row = next((row for row in rows if word_to_replace in (row.text, row.lemma)), None)
+    if row is None:
         if debug:
             print(f"Could not find lemma for '{word_to_replace}' in the sentence.")
-        return []
+        return None
+    lemmatized_word = row.lemma
 
     # Check if the lemmatized word exists in the database with simplicity score <= 10000
-    complex_simplicity_score = fetch_word_simplicity_score(cursor, lemmatized_word)
+    complex_simplicity_score = lookup_simplicity_score(cursor, lemmatized_word, lexicon)
     if complex_simplicity_score is None:
         if debug:
             print(f"Skipping '{word_to_replace}' (lemmatized as '{lemmatized_word}') for model suggestions (not in database).")
-        return []
+        return None
     elif complex_simplicity_score > 10000:
         if debug:
             print(f"Skipping '{word_to_replace}' (lemmatized as '{lemmatized_word}') for model suggestions (simplicity score > 10000).")
-        return []
+        return None
 
-    # Use SpaCy to get the POS of the original word
-    doc = nlp(sentence)
-    original_word_type = None
-    for token in doc:
-        if token.text == word_to_replace:
-            original_word_type = token.pos_
-            break
-
-    if original_word_type is None:
+    if row.pos is None:
         if debug:
             print(f"Could not determine word type for '{word_to_replace}' in the sentence.")
-        return []
+        return None
+    return row, complex_simplicity_score
 
-    # Masking the sentence for candidate generation
-    masked_sentence = sentence.replace(word_to_replace, tokenizer.mask_token)
-    inputs = tokenizer(masked_sentence, return_tensors="pt")
-    
-    with torch.no_grad():
-        outputs = mask_model(**inputs)
-    
-    mask_token_index = torch.where(inputs['input_ids'] == tokenizer.mask_token_id)[1]
-    mask_token_logits = outputs.logits[0, mask_token_index, :]
-    top_tokens = torch.topk(mask_token_logits, 5, dim=1).indices[0].tolist()
-    
-    # Filter candidates to match the original word type and format output
-    formatted_candidates = []
+def split_mask_model(mask_model):
+    """
+    :return: Tuple (encoder, language model head) of a PyTorch masked language model (BERT, RoBERTa
+             and their int8 versions), or None when the model cannot be split (an exported ONNX graph).
+    """
+    import torch
+    if not isinstance(mask_model, torch.nn.Module):
+        return None
+    encoder = getattr(mask_model, getattr(mask_model, 'base_model_prefix', ''), None)
+    head = getattr(mask_model, 'cls', None)
+    if head is None:
+        head = getattr(mask_model, 'lm_head', None)
+    if encoder is None or head is None:
+        return None
+    return encoder, head
+
+def predict_masked_words(sentence, rows, top_k=MLM_TOP_K, batch_size=MLM_BATCH_SIZE, mask_model=None):
+    """
+    Predict replacements for several words of a sentence in batches.
+    Every word gets its own copy of the sentence, masked at the word's character offsets; the copies
+    run through the masked language model as padded batches and the top-k of all masks is taken at once.
+    The language model head only runs on the hidden states of the masks, so a batch never holds the
+    logits of every token ([batch, length, vocabulary], about 1 GB in fp32 for 16 copies of 512
+    tokens). Models that cannot be split (ONNX) run in sub-batches whose logits fit in MLM_MAX_LOGITS_MB.
+    :param sentence: Sentence (segment) containing the words, or a list with the sentence of every row.
+    :param rows: TokenRows of the words to mask.
+    :param top_k: Number of predictions per word.
+    :param batch_size: Number of masked copies per forward pass.
+    :param mask_model: Tuple (tokenizer, model) to use instead of get_mask_model().
+    :return: List with the top-k predicted words for every row (empty if the mask was truncated away).
+    """
+    import torch
+    tokenizer, mask_model = mask_model or get_mask_model()
+    sentences = [sentence] * len(rows) if isinstance(sentence, str) else sentence
+    masked_sentences = [sentence[:row.start] + tokenizer.mask_token + sentence[row.end:]
+                        for sentence, row in zip(sentences, rows)]
+    split_model = split_mask_model(mask_model)
+
+    mask_logits = []
+    mask_rows = []
+    for i in range(0, len(masked_sentences), batch_size):
+        inputs = tokenizer(masked_sentences[i:i + batch_size], return_tensors="pt", padding=True,
+                           truncation=True, max_length=MLM_MAX_LENGTH)
+        batch_index, token_index = torch.where(inputs['input_ids'] == tokenizer.mask_token_id)
+        with torch.no_grad():
+            if split_model is not None:
+                encoder, head = split_model
+                hidden_states = encoder(**inputs)[0]
+                mask_logits.append(head(hidden_states[batch_index, token_index]))
+            else:
+                length = inputs['input_ids'].shape[1]
+                sub_batch_size = max(1, MLM_MAX_LOGITS_MB * 2 ** 20 // (length * len(tokenizer) * 4))
+                for j in range(0, inputs['input_ids'].shape[0], sub_batch_size):
+                    logits = mask_model(**{name: value[j:j + sub_batch_size] for name, value in inputs.items()}).logits
+                    in_sub_batch = (batch_index >= j) & (batch_index < j + sub_batch_size)
+                    mask_logits.append(logits[batch_index[in_sub_batch] - j, token_index[in_sub_batch], :])
+        mask_rows.extend((batch_index + i).tolist())
+
+    predictions = [[] for _ in rows]
+    if mask_rows:
+        top_tokens = torch.topk(torch.cat(mask_logits), top_k, dim=1).indices.tolist()
+        for row_index, token_ids in zip(mask_rows, top_tokens):
+            if not predictions[row_index]:  # The first mask of a copy is the word's own
+                predictions[row_index] = [tokenizer.decode([token_id]).strip() for token_id in token_ids]
+    return predictions
+
+def filter_candidates(sentence, word_to_replace, row, complex_simplicity_score, predictions, position, cursor,
+                      debug=False, lexicon=None):
+    """
+    Turn the model's predictions for a word into candidates, keeping those of the same word type
+    that are in the database with a simplicity score <= 10000.
+    :return: Tuple (list of Candidate records without relatedness score, list with the sentence of
+             each candidate, with the candidate in place).
+    """
+    original_word_type = row.pos
+    lemmatized_word = row.lemma
+
+    # Filter candidates to match the original word type
+    candidates = []
+    candidate_sentences = []
+    original_forms = {row.text.lower(), lemmatized_word}
     if debug:
         print("Top candidates:")
-    for token_id in top_tokens:
-        candidate = tokenizer.decode([token_id]).strip()
-        if candidate == word_to_replace:
+    for candidate in predictions:
+        if candidate.lower() in original_forms:
             if debug:
                 print(f"Filtering out '{candidate}': same as original word.")
             continue
         # check if the candidate is a contains the original word ( prevent a compound word to be replaced by one of its components)
-        if word_to_replace in candidate:
+        if any(form in candidate.lower() for form in original_forms):
             if debug:
                 print(f"Filtering out '{candidate}': contains original word.")
             continue
-        candidate_sentence = sentence.replace(word_to_replace, candidate)
-        lemmatized_candidate = lemmatize_in_context(candidate_sentence, candidate)
-
-        # Fetch POS for candidate and check match with original
-        candidate_doc = nlp(candidate_sentence)
-        candidate_word_type = None
-        for token in candidate_doc:
-            if token.text == candidate:
-                candidate_word_type = token.pos_
-                break
+        candidate_sentence = sentence[:row.start] + candidate + sentence[row.end:]
+
+        # Lemma and POS of the candidate in its context, from the cache or a parse of its neighbourhood
+        lemmatized_candidate, candidate_word_type = analyze_candidate(candidate, candidate_sentence, row.start, cursor)
         if candidate_word_type != original_word_type:
             if debug:
                 print(f"Filtering out '{candidate}' due to word type mismatch (expected '{original_word_type}', got '{candidate_word_type}').")
             continue
         
-        candidate_simplicity_score = fetch_word_simplicity_score(cursor, lemmatized_candidate)
+        candidate_simplicity_score = lookup_simplicity_score(cursor, lemmatized_candidate, lexicon)
         if candidate_simplicity_score is None:
             if debug:
                 print(f"Filtering out '{candidate}' (lemmatized as '{lemmatized_candidate}'): not in database.")
@@ -206,101 +525,409 @@ def generate_candidates(sentence, word_to_replace, cursor, position, debug=False
                 print(f"Filtering out '{candidate}' (lemmatized as '{lemmatized_candidate}'): simplicity score {candidate_simplicity_score} > 10000.")
             continue
 
-        similarity_score = check_simcse_similarity(sentence, candidate_sentence)
+        # The similarity is filled in by score_candidates, for all candidates of a segment at once
+        candidates.append(Candidate(position, word_to_replace, complex_simplicity_score, candidate,
+                                    candidate_simplicity_score, None, 'model'))
+        candidate_sentences.append(candidate_sentence)
+    
+    return candidates, candidate_sentences
+
+def score_candidates(sentence, candidates, candidate_sentences, debug=False):
+    """
+    Set the relatedness score of model candidates to the SimCSE similarity between the sentence
+    and the sentence with the candidate in place, encoding all sentences in one batch.
+    :param sentence: The original sentence, or a list with the original sentence of every candidate.
+    :return: The candidates.
+    """
+    if isinstance(sentence, str):
+        similarities = score_simcse_similarities(sentence, candidate_sentences)
+    else:
+        similarities = score_simcse_pairs(sentence, candidate_sentences)
+    for candidate, similarity_score in zip(candidates, similarities):
+        candidate.relatedness_score = similarity_score
         if debug:
-            formatted_candidate = f"{word_to_replace}|{position}|{complex_simplicity_score}|{candidate}|{candidate_simplicity_score}|{similarity_score}"
+            print(f"Accepted candidate '{candidate.synonym}': {encode_candidate(candidate, debug=True)}")
+    return candidates
+
+# Generate model-based synonym candidates in the same format as database suggestions
+def generate_candidates(sentence, word_to_replace, cursor, position, debug=False, lexicon=None, row=None,
+                        context_window=CONTEXT_WINDOW):
+    """
+    Generate model-based replacement candidates for a single word of a sentence.
+    :param sentence: Sentence (segment) containing the word.
+    :param word_to_replace: The word, or its lemma.
+    :param cursor: SQLite cursor.
+    :param position: Position reported in the candidates.
+    :param debug: Print why candidates are accepted or filtered out.
+    :param lexicon: Optional shared lexicon serving the simplicity scores.
+    :param row: TokenRow of the word from parse_segment(sentence); without it the sentence is parsed here.
+    :param context_window: Part of the sentence the models see (see context_windows).
+    :return: List of Candidate records.
+    """
+    if debug:
+        print(f"\nGenerating candidates for '{word_to_replace}' at position {position}")
+    target = select_target(sentence, word_to_replace, cursor, debug, lexicon, row)
+    if target is None:
+        return []
+    return model_candidates(sentence, [target], [position], cursor, debug, lexicon, words=[word_to_replace],
+                            context_window=context_window)
+
+def context_windows(sentence, rows, context_window=None):
+    """
+    The text the models see for each word: the whole sentence (segment), the sentence of the word
+    within it, or the word with up to N words on each side.
+    :param sentence: Sentence (segment) containing the words.
+    :param rows: TokenRows of the words, from parse_segment(sentence).
+    :param context_window: None, 'sentence' or a number of words N.
+    :return: List of (window, row) tuples, with the position and offsets of each row relative to its window.
+    """
+    from bisect import bisect_left, bisect_right
+    if context_window is None:
+        return [(sentence, row) for row in rows]
+    word_spans = [match.span() for match in re.finditer(r'\w+', sentence)]
+    word_starts = [start for start, _ in word_spans]
+    if context_window == 'sentence':
+        spans = sentence_spans(sentence)
+        span_starts = [start for start, _ in spans]
+    elif not isinstance(context_window, int) or context_window < 0:
+        raise ValueError(f"Unknown context window {context_window!r}, expected None, 'sentence' or a number of words.")
+
+    windows = []
+    for row in rows:
+        if context_window == 'sentence':
+            start, end = spans[max(bisect_right(span_starts, row.start) - 1, 0)]
         else:
-            formatted_candidate = f"{position}|{complex_simplicity_score}|{candidate}|{candidate_simplicity_score}|{similarity_score}"
-        formatted_candidates.append(formatted_candidate)
-        
+            start = word_spans[max(row.position - context_window, 0)][0]
+            end = word_spans[min(row.position + context_window, len(word_spans) - 1)][1]
+        first_word = bisect_left(word_starts, start)
+        windows.append((sentence[start:end], row._replace(position=row.position - first_word,
+                                                          start=row.start - start, end=row.end - start)))
+    return windows
+
+# Scored model candidates of words in contexts seen before (see candidateCache); None disables the cache
+candidate_cache = open_candidate_cache()
+
+def database_path(cursor=None):
+    """
+    :return: Absolute path of the database the cursor reads, or None when unknown.
+    """
+    if cursor is not None:
+        for _, name, path in cursor.execute('PRAGMA database_list').fetchall():
+            if name == 'main':
+                return os.path.abspath(path) if path else None
+    return None
+
+def lexicon_path(lexicon=None):
+    """
+    :return: Absolute path of the file a lexicon serves (a SQLite database or a frozen lexicon), or None.
+    """
+    path = getattr(lexicon, 'db_path', None) or getattr(lexicon, 'path', None)
+    return os.path.abspath(path) if path else None
+
+def candidate_cache_versions(cursor=None, lexicon=None):
+    """
+    :return: Models, settings and the state of the database and lexicon files the model candidates
+             depend on, part of every candidate cache key. A file signature changes with every
+             write, so entries of an older state of the files are not served.
+    """
+    return [SPACY_MODEL, MLM_MODEL, SIMCSE_MODEL, inferenceBackend.backend, MLM_TOP_K, MLM_MAX_LENGTH] + \
+           [[path, file_signature(path)] if path else None for path in (database_path(cursor), lexicon_path(lexicon))]
+
+def model_candidates(sentence, targets, positions, cursor, debug=False, lexicon=None, batch_size=MLM_BATCH_SIZE,
+                     words=None, context_window=CONTEXT_WINDOW):
+    """
+    Scored model candidates for the selected words of a sentence. Words seen in the same context
+    before are served from the candidate cache; the others go through one batched masked language
+    model pass and one SimCSE batch, and their candidates are added to the cache.
+    :param sentence: Sentence (segment) containing the words.
+    :param targets: List of (row, simplicity score) tuples from select_target.
+    :param positions: Position reported in the candidates of each target.
+    :param cursor: SQLite cursor.
+    :param debug: Print why candidates are accepted or filtered out.
+    :param lexicon: Optional shared lexicon serving the simplicity scores.
+    :param batch_size: Number of masked copies of the sentence per forward pass.
+    :param words: Word reported in the candidates of each target (default: the lemmas).
+    :param context_window: Part of the sentence the models see (see context_windows).
+    :return: List of Candidate records, in the order of the targets.
+    """
+    words = words or [row.lemma for row, _ in targets]
+    windows = context_windows(sentence, [row for row, _ in targets], context_window)
+    versions = candidate_cache_versions(cursor, lexicon)
+    results = [None] * len(targets)
+    keys = [None] * len(targets)
+    if candidate_cache is not None:
+        for i, (window, row) in enumerate(windows):
+            keys[i] = context_key(window, row.position, versions)
+            cached = candidate_cache.get(keys[i])
+            if cached is not None:
+                if debug:
+                    print(f"\nCandidates for '{words[i]}' at position {positions[i]} from the cache.")
+                results[i] = [Candidate(positions[i], words[i], targets[i][1], synonym,
+                                        synonym_simplicity_score, relatedness_score, 'model')
+                              for synonym, synonym_simplicity_score, relatedness_score in cached]
+
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        predictions = predict_masked_words([windows[i][0] for i in missing], [windows[i][1] for i in missing],
+                                           batch_size=batch_size)
+        candidates = []
+        candidate_sentences = []
+        original_sentences = []
+        for i, row_predictions in zip(missing, predictions):
+            window, row = windows[i]
+            if debug:
+                print(f"\nGenerating candidates for '{words[i]}' at position {positions[i]}")
+            results[i], row_sentences = filter_candidates(window, words[i], row, targets[i][1], row_predictions,
+                                                          positions[i], cursor, debug, lexicon)
+            candidates.extend(results[i])
+            candidate_sentences.extend(row_sentences)
+            original_sentences.extend([window] * len(row_sentences))
+        # One SimCSE batch for the surviving candidates of all targets
+        score_candidates(original_sentences, candidates, candidate_sentences, debug)
+
+        if candidate_cache is not None:
+            for i in missing:
+                candidate_cache.put(keys[i], [[candidate.synonym, candidate.synonym_simplicity_score,
+                                               candidate.relatedness_score] for candidate in results[i]])
+    return [candidate for result in results for candidate in result]
+
+def generate_segment_candidates(segment, rows, cursor, initial_word_count=0, debug=False, lexicon=None,
+                                batch_size=MLM_BATCH_SIZE, context_window=CONTEXT_WINDOW):
+    """
+    Generate model-based replacement candidates for all words of a segment, with one batched
+    masked language model pass over all words that qualify and one SimCSE batch for all candidates.
+    Words seen in the same context before are served from the candidate cache.
+    :param segment: The segment.
+    :param rows: Token table of the segment from parse_segment(segment).
+    :param cursor: SQLite cursor.
+    :param initial_word_count: Position of the first word of the segment in the full text.
+    :param debug: Print why words and candidates are skipped.
+    :param lexicon: Optional shared lexicon serving the simplicity scores.
+    :param batch_size: Number of masked copies of the segment per forward pass.
+    :param context_window: Part of the segment the models see for each word: None (all of it),
+                           'sentence' (the word's sentence) or N (the word with N words on each side).
+    :return: List of Candidate records.
+    """
+    targets = []
+    for row in rows:
         if debug:
-            print(f"Accepted candidate '{candidate}': {formatted_candidate}")
-    
-    return formatted_candidates
+            print(f"\nSelecting '{row.lemma}' at position {row.position + initial_word_count}")
+        target = select_target(segment, row.lemma, cursor, debug, lexicon, row)
+        if target is not None:
+            targets.append(target)
+    if not targets:
+        return []
+
+    positions = [row.position + initial_word_count for row, _ in targets]
+    return model_candidates(segment, targets, positions, cursor, debug, lexicon, batch_size,
+                            context_window=context_window)
+
+
+# A window of the text: its (cased) text, character offsets in the full text and the position of its first word
+Segment = namedtuple('Segment', ['text', 'start', 'end', 'first_word'])
 
+SENTENCE_END = re.compile(r'[.!?]+["\')\]]*\s+|\n+')
+
+def sentence_spans(text):
+    """
+    :return: List of (start, end) character offsets of the sentences (and lines) of a text,
+             without surrounding whitespace.
+    """
+    spans = []
+    start = 0
+    for match in SENTENCE_END.finditer(text):
+        spans.append((start, match.end()))
+        start = match.end()
+    spans.append((start, len(text)))
+
+    stripped = []
+    for start, end in spans:
+        sentence = text[start:end]
+        if sentence.strip():
+            stripped.append((start + len(sentence) - len(sentence.lstrip()), end - (len(sentence) - len(sentence.rstrip()))))
+    return stripped
+
+def segment_text(text, max_tokens=512, tokenizer=None):
+    """
+    Split a text into windows of at most max_tokens model tokens (special tokens included),
+    packing whole sentences together. The text is tokenized once, with the offset mapping of the
+    fast tokenizer; a sentence longer than a window is split between words.
+    :param text: The text, with its original case and punctuation.
+    :param max_tokens: Maximum number of model tokens per segment.
+    :param tokenizer: Tokenizer to count with (default: the masked language model's).
+    :return: List of Segments.
+    """
+    from bisect import bisect_left
+    if tokenizer is None:
+        tokenizer = get_mask_model()[0]
+    budget = max_tokens - tokenizer.num_special_tokens_to_add()
+
+    if getattr(tokenizer, 'is_fast', False):
+        offsets = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)['offset_mapping']
+        token_starts = [start for start, end in offsets if end > start]
+    else:
+        # Slow tokenizers have no offsets: one batched call over the words instead
+        words = list(re.finditer(r'\S+', text))
+        counts = tokenizer([word.group() for word in words], add_special_tokens=False)['input_ids'] if words else []
+        token_starts = [word.start() for word, ids in zip(words, counts) for _ in ids]
+
+    def count_tokens(start, end):
+        return bisect_left(token_starts, end) - bisect_left(token_starts, start)
+
+    # Sentences longer than a window are cut into pieces of whole (whitespace separated) words
+    pieces = []
+    for start, end in sentence_spans(text):
+        if count_tokens(start, end) <= budget:
+            pieces.append((start, end))
+            continue
+        piece_start, piece_end = start, start
+        for word in re.finditer(r'\S+', text[start:end]):
+            word_start, word_end = start + word.start(), start + word.end()
+            if piece_end > piece_start and count_tokens(piece_start, word_end) > budget:
+                pieces.append((piece_start, piece_end))
+                piece_start = word_start
+            piece_end = word_end
+        pieces.append((piece_start, piece_end))
+
+    # Pack consecutive pieces into windows
+    windows = []
+    for start, end in pieces:
+        if windows and count_tokens(windows[-1][0], end) <= budget:
+            windows[-1] = (windows[-1][0], end)
+        else:
+            windows.append((start, end))
+
+    word_starts = [match.start() for match in re.finditer(r'\w+', text)]
+    return [Segment(text[start:end], start, end, bisect_left(word_starts, start)) for start, end in windows]
 
 # Main function to suggest replacements from both sources
-def suggest_replacements(text, db_path='dutch_synonyms_NN.db', debug=False, max_tokens=512):
-    conn, cursor = open_database(db_path)
-    
-    segments = []
-    current_segment = []
-    current_length = 0
+def find_replacement_candidates(text, db_path='dutch_synonyms_NN.db', debug=False, max_tokens=512,
+                                mlm_batch_size=MLM_BATCH_SIZE, context_window=CONTEXT_WINDOW, lexicon=None):
+    """
+    Find database and model replacement candidates for every word of a text.
+    :param text: Text to simplify.
+    :param db_path: Path to the SQLite synonym database, or None to serve from the lexicon alone
+                    (words that do not line up with a SpaCy token then keep their own form as lemma).
+    :param debug: Print the candidates and the reasons for skipping words.
+    :param max_tokens: Maximum number of model tokens per segment (see segment_text).
+    :param mlm_batch_size: Number of masked copies of a segment per masked language model pass.
+    :param context_window: Model input per word (see generate_segment_candidates).
+    :param lexicon: Lexicon serving the words, scores and synonyms, e.g. a frozenLexicon.FrozenLexicon
+                    (default: the shared lexicon of db_path).
+    :return: Tuple (database candidates, model candidates), both lists of Candidate records.
+    """
+    if db_path is None and lexicon is None:
+        raise ValueError("Give a database path, a lexicon or both.")
+    # Queries borrow a read-only connection from the pool shared by all requests for each statement
+    # only, so no connection is held during parsing and model inference
+    cursor = get_pool(db_path).cursor() if db_path is not None else None
+    # Words, scores and synonym lists shared by all requests on this database
+    if lexicon is None:
+        lexicon = get_lexicon(db_path)
+
+    # Windows of whole sentences, in their original case, tokenized once
+    segments = segment_text(text, max_tokens)
+    db_candidates = []
+    model_candidates = []
 
-    words = re.findall(r'\w+', text.lower())
-    for word in words:
-        token_length = len(tokenizer(word)['input_ids'])
-        if current_length + token_length > max_tokens:
-            segments.append(" ".join(current_segment))
-            current_segment = []
-            current_length = 0
-        current_segment.append(word)
-        current_length += token_length
-
-    if current_segment:
-        segments.append(" ".join(current_segment))
-    db_suggestions = []
-    model_suggestions = []
-    current_word_count = 0
-    
     for segment in segments:
-        db_suggestion, temp_word_count = extract_word_scores_and_synonyms(segment, cursor, current_word_count, debug=debug)
-        db_suggestions.append(db_suggestion)
-        
-        lemmatized_segment = " ".join([token.lemma_ for token in nlp(segment)])
-        word_positions = {index + current_word_count: word for index, word in enumerate(re.findall(r'\w+', lemmatized_segment.lower()))}
-        model_string = ""
-        for position, word in word_positions.items():
-            candidates = generate_candidates(segment, word, cursor, position, debug=debug)
-            if candidates:
-                for candidate in candidates:
-                    model_suggestions.append(candidate)
-                    model_string += candidate + ";"
-        model_suggestions.append(model_string)
-        current_word_count += temp_word_count
-            
-    # Combine all db_suggestions and model_suggestions into single strings
-    combined_db_suggestions = ";".join(db_suggestions)
-    combined_model_suggestions = ";".join(model_suggestions)
+        spacy_calls = getattr(thread_counters, 'spacy_calls', 0)
+        # Parse the segment once; the token table serves the lemmas and POS tags of all its words
+        _, rows = parse_segment(segment.text, cursor)
+        segment_candidates, _ = find_db_candidates(segment.text, cursor, segment.first_word, debug=debug,
+                                                   lexicon=lexicon, lemmas=[row.lemma for row in rows])
+        db_candidates.extend(segment_candidates)
+
+        model_candidates.extend(generate_segment_candidates(segment.text, rows, cursor, segment.first_word,
+                                                            debug=debug, lexicon=lexicon, batch_size=mlm_batch_size,
+                                                            context_window=context_window))
+        segment_spacy_calls = getattr(thread_counters, 'spacy_calls', 0) - spacy_calls
+        with metrics_lock:
+            metrics['segments'] += 1
+            metrics['last_segment_spacy_calls'] = segment_spacy_calls
 
     if debug:
         print("\nCombined Database Suggestions:")
-        for suggestion in combined_db_suggestions.split(";"):
-            print(suggestion)
+        for candidate in db_candidates:
+            print(encode_candidate(candidate, debug=True))
         
         print("\nCombined Model Suggestions:")
-        for suggestion in combined_model_suggestions.split(";"):
-            print(suggestion)
-    
-    close_database(conn)
-    
-    # normalize both databases into a single long string
-    
-    return combined_db_suggestions, combined_model_suggestions
+        for candidate in model_candidates:
+            print(encode_candidate(candidate, debug=True))
 
-def fill_in_replacements(model_suggestions, db_suggestions, text, debug=False):
-    simplicity_weight = 0.5
-    relatedness_weight = 0.5
-    
-    # Input data format (no debug): position|simplicity_score|synonym|synonym_simplicity_score|relatedness_score
-    # Input data format (debug): word|position|simplicity_score|synonym|synonym_simplicity_score|relatedness_score
-
-    # Parse the suggestions into lists of tuples, keeping all entries
-    db_entries = []
-    for suggestion in db_suggestions.split(";"):
-        if suggestion:
-            parts = suggestion.split("|")
-            position = int(parts[1]) if debug else int(parts[0])
-            entry = parts[2:] if debug else parts[1:]
-            db_entries.append((position, entry))
-    
-    model_entries = []
-    for suggestion in model_suggestions.split(";"):
-        if suggestion:
-            parts = suggestion.split("|")
-            position = int(parts[1]) if debug else int(parts[0])
-            entry = parts[2:] if debug else parts[1:]
-            model_entries.append((position, entry))
+    return db_candidates, model_candidates
+
+def suggest_replacements(text, db_path='dutch_synonyms_NN.db', debug=False, max_tokens=512,
+                         context_window=CONTEXT_WINDOW, lexicon=None):
+    """
+    Wire format of find_replacement_candidates: both candidate lists encoded as
+    "position|simplicity_score|synonym|synonym_simplicity_score|relatedness_score" entries separated
+    by ";" (prefixed with "word|" when debug is True).
+    :return: Tuple (database suggestions, model suggestions) as strings.
+    """
+    db_candidates, model_candidates = find_replacement_candidates(text, db_path, debug, max_tokens,
+                                                                  context_window=context_window, lexicon=lexicon)
+    return encode_candidates(db_candidates, debug), encode_candidates(model_candidates, debug)
+
+def rank_replacements(db_candidates, model_candidates, simplicity_weight=SIMPLICITY_WEIGHT,
+                      relatedness_weight=RELATEDNESS_WEIGHT):
+    """
+    Pick the best replacement for every position in one vectorised pass over all candidates.
+    A candidate qualifies when its synonym scores higher (simpler) than the word it replaces. It is
+    ranked by
+        simplicity_weight * (synonym_score - score) / (|synonym_score| + |score|) + relatedness_weight * relatedness
+    where the simplicity gain is scale free, so it can be weighed against relatedness. Database
+    candidates are preferred over model candidates at the same position.
+    :param db_candidates: Candidate records from the database.
+    :param model_candidates: Candidate records from the model.
+    :param simplicity_weight: Weight of the simplicity gain.
+    :param relatedness_weight: Weight of the relatedness (database) or similarity (model) score.
+    :return: Dictionary position -> best Candidate.
+    """
+    import numpy as np
+    candidates = [candidate for candidate in list(db_candidates) + list(model_candidates)
+                  if candidate.synonym is not None and candidate.simplicity_score is not None
+                  and candidate.synonym_simplicity_score is not None]
+    if not candidates:
+        return {}
+
+    positions = np.fromiter((candidate.position for candidate in candidates), dtype=np.int64, count=len(candidates))
+    from_db = np.fromiter((candidate.source == 'db' for candidate in candidates), dtype=bool, count=len(candidates))
+    scores = np.array([candidate.simplicity_score for candidate in candidates], dtype=np.float64)
+    synonym_scores = np.array([candidate.synonym_simplicity_score for candidate in candidates], dtype=np.float64)
+    relatedness = np.array([np.nan if candidate.relatedness_score is None else candidate.relatedness_score
+                            for candidate in candidates], dtype=np.float64)
+
+    qualifies = scores < synonym_scores
+    denominator = np.abs(scores) + np.abs(synonym_scores)
+    gain = np.divide(synonym_scores - scores, denominator, out=np.zeros_like(scores), where=denominator > 0)
+    ranking = simplicity_weight * gain + relatedness_weight * np.nan_to_num(relatedness)
+
+    # Sort by position, then database first, then best ranking; the first qualifying candidate of
+    # each position wins
+    order = np.lexsort((-ranking, ~from_db, positions))
+    order = order[qualifies[order]]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = positions[order][1:] != positions[order][:-1]
+    return {int(positions[i]): candidates[i] for i in order[first]}
+
+def fill_in_replacements(model_suggestions, db_suggestions, text, debug=False, simplicity_weight=SIMPLICITY_WEIGHT,
+                         relatedness_weight=RELATEDNESS_WEIGHT):
+    """
+    Replace the words of a text by their best database replacement, or else their best model replacement.
+    :param model_suggestions: Model candidates, as Candidate records or in the wire format.
+    :param db_suggestions: Database candidates, as Candidate records or in the wire format.
+    :param text: The original text.
+    :param debug: Unused; kept for callers passing the debug flag of suggest_replacements.
+    :param simplicity_weight: Weight of the simplicity gain in the ranking (see rank_replacements).
+    :param relatedness_weight: Weight of the relatedness score in the ranking.
+    :return: The text with the replacements filled in.
+    """
+    if isinstance(db_suggestions, str):
+        db_suggestions = decode_candidates(db_suggestions, 'db')
+    if isinstance(model_suggestions, str):
+        model_suggestions = decode_candidates(model_suggestions, 'model')
+    best_replacements = rank_replacements(db_suggestions, model_suggestions, simplicity_weight, relatedness_weight)
 
     lines = text.splitlines()
     result_lines = []
@@ -309,60 +936,21 @@ def fill_in_replacements(model_suggestions, db_suggestions, text, debug=False):
 
     for line in lines:
         result_tokens = re.findall(r'\w+|[^\w\s]', line)  # Tokenize line with punctuation preservation
-        line_word_counter = 0  # A counter for words within this line
 
         for i, token in enumerate(result_tokens):
             if not re.match(r'\w+', token):  # Check if token is not a word (punctuation or whitespace)
                 continue
 
-            # Collect all DB and model replacements for the current word position
-            db_replacements = [entry for pos, entry in db_entries if pos == word_counter]
-            model_replacements = [entry for pos, entry in model_entries if pos == word_counter]
-            
-            # Find the best DB replacement based on simplicity score
-            best_db_replacement = None
-            best_db_simplicity_score = float('inf')
-            
-            for replacement in db_replacements:
-                if replacement[2] != "NONE" and float(replacement[0]) < float(replacement[2]):
-                    synonym_simplicity_score = float(replacement[2])
-                    if synonym_simplicity_score < best_db_simplicity_score:
-                        best_db_simplicity_score = synonym_simplicity_score
-                        best_db_replacement = replacement[1]  # synonym
-
-            # If a DB replacement is found, apply it and skip to the next word
-            if best_db_replacement:
-                print(f"Putting the word: {best_db_replacement} in place of {token} at position {word_counter} (DB)")
+            best_replacement = best_replacements.get(word_counter)
+            if best_replacement is not None:
+                source = 'DB' if best_replacement.source == 'db' else 'Model'
+                print(f"Putting the word: {best_replacement.synonym} in place of {token} at position {word_counter} ({source})")
                 result_tokens[i] = (
-                    best_db_replacement.capitalize() if token[0].isupper() else best_db_replacement
-                )
-                word_counter += 1  # Increase word count since we handled a word
-                line_word_counter += 1
-                continue
-
-            # If no DB replacement is used, find the best model replacement
-            best_model_replacement = None
-            best_model_score = float('-inf')
-            
-            for replacement in model_replacements:
-                if replacement[2] != "NONE" and float(replacement[0]) < float(replacement[2]):
-                    simplicity_score = float(replacement[0])
-                    relatedness_score = float(replacement[2])
-                    score = simplicity_score * relatedness_score  # Combined score for model suggestions
-                    if score > best_model_score:
-                        best_model_score = score
-                        best_model_replacement = replacement[1]  # synonym
-
-            # Apply the best model replacement if it exists
-            if best_model_replacement:
-                print(f"Putting the word: {best_model_replacement} in place of {token} at position {word_counter} (Model)")
-                result_tokens[i] = (
-                    best_model_replacement.capitalize() if token[0].isupper() else best_model_replacement
+                    best_replacement.synonym.capitalize() if token[0].isupper() else best_replacement.synonym
                 )
 
             # Increase word count only after processing a word token
             word_counter += 1
-            line_word_counter += 1
 
         # Reconstruct line and add it to result lines
         result_line = ' '.join(result_tokens).replace(' .', '.').replace(' ,', ',')
@@ -379,24 +967,30 @@ def fill_in_replacements(model_suggestions, db_suggestions, text, debug=False):
     
  
 # Example usage
-text = "In Nederland is het niet verboden om een product onder de inkoopprijs te verkopen. Vooral supermarkten verkopen soms hun producten onder de inkoopprijs. Zo hebben zij een voordeel op hun concurrenten. Dat is gunstig voor de consument. De overheid wil verkoop beneden de inkoopprijs niet verbieden. De verwachting is namelijk dat een dergelijk verbod geen effect heeft op de positie van kleinere kruideniers of van leveranciers (boeren en tuinders).\n\nHet energielabel geeft aan hoe goed een woning is geïsoleerd (zogenoemde isolatieniveau). En hoe dak, vloeren en ramen van een woning optimaal geïsoleerd kunnen worden (zogenoemde streefwaarden). Bij een oude woning liggen de streefwaarden lager dan bij een nieuwe woning. Als een dak, vloer of raam optimaal is geïsoleerd, vermeldt het energielabel dat het voldoet aan de standaard voor woningisolatie.\n\nIs het tarief van de kinderopvang hoger dan de maximale vergoeding? Dan betalen de ouders het bedrag boven de maximale uurprijs zelf. Is het tarief van de kinderopvang lager dan de maximumprijs per uur? Dan krijgen ouders over dat goedkopere uurtarief kinderopvangtoeslag.\n\nHeeft u van de politie een bekeuring ontvangen voor het niet voldoen aan de identificatieplicht? Dan kunt u hiertegen geen bezwaar maken. Van het Centraal Justitieel Incassobureau (CJIB) ontvangt u een acceptgiro om de boete te betalen. Betaalt u de boete niet, dan beslist de officier van Justitie of u strafrechtelijk wordt vervolgd. Dit kan nog tot 2 jaar na de datum van de overtreding.\n\nBij een ramp kunnen mensen en bedrijven materiële schade lijden. Het kabinet kan gedupeerden dan helpen met de Wet tegemoetkoming schade bij rampen (Wts). Dankzij de Wts kunnen gedupeerden onder voorwaarden, een financiële tegemoetkoming krijgen voor de geleden schade en kosten. Het gaat daarbij alleen om schade die niet verhaalbaar, niet vermijdbaar en niet redelijkerwijs verzekerbaar is.\n\nVogelgriep verspreidt zich in Nederland door bijvoorbeeld trekvogels. Dit heeft grote gevolgen voor de natuur en pluimveebedrijven. De Rijksoverheid neemt bij verdenking van vogelgriep maatregelen om verspreiding tegen te gaan. Ook is er een plan om besmetting met het virus zo veel mogelijk te voorkomen.\n\nDe mensen in het gaswinningsgebied willen dat de overheid voorrang geeft aan het verbeteren van de schadeafhandeling. En de versterking van onveilige huizen zo snel mogelijk afrondt. 29 van de 50 maatregelen die de overheid neemt, zijn bedoeld om dit voor elkaar te krijgen.\n\nGemeenten hebben per 1 februari 2024 met de Wet gemeentelijke taak mogelijk maken asielopvangvoorzieningen (Spreidingswet) een wettelijke taak in de opvang van asielzoekers. Het doel van de wet is te komen tot voldoende opvangplekken en een evenwichtiger verdeling van asielzoekers over provincies en gemeenten.\n\nOm terug te keren naar het land van herkomst heeft de vreemdeling een geldig reisdocument nodig, zoals een paspoort. Het komt voor dat vreemdelingen geen geldig reisdocument hebben. Het land van herkomst moet de vreemdeling dan identificeren. Daarnaast regelt het land van herkomst van de vreemdeling een (vervangend) reisdocument, zoals een noodreisdocument (een laissez-passer).\n\nDe basisschool bewaart verschillende gegevens over uw kind in een leerlingdossier, zoals de leerresultaten. U en de school mogen deze gegevens inzien. In speciale gevallen mogen anderen dat ook, zoals in een noodsituatie of bij een vermoeden van kindermishandeling."
-debug = True
-db_suggestions, model_suggestions = suggest_replacements(text, debug=debug)
-reformed_text = fill_in_replacements(model_suggestions, db_suggestions, text, debug=debug)
-
-print("Original text:")
-print(text)
-print("\nReformed text:")
-print(reformed_text)
-
-print(f"Execution time: {time.time() - start_time:.2f} seconds")
-## print all the stopwords
-#print(stopwords)
-
-
-# print the words types of the whole sentence
-# doc = nlp(text)
-# for token in doc:
-#     print(token.text, token.pos_)
-    
+# Example text of Dutch government information, used by the demo and the benchmarks
+EXAMPLE_TEXT = "In Nederland is het niet verboden om een product onder de inkoopprijs te verkopen. Vooral supermarkten verkopen soms hun producten onder de inkoopprijs. Zo hebben zij een voordeel op hun concurrenten. Dat is gunstig voor de consument. De overheid wil verkoop beneden de inkoopprijs niet verbieden. De verwachting is namelijk dat een dergelijk verbod geen effect heeft op de positie van kleinere kruideniers of van leveranciers (boeren en tuinders).\n\nHet energielabel geeft aan hoe goed een woning is geïsoleerd (zogenoemde isolatieniveau). En hoe dak, vloeren en ramen van een woning optimaal geïsoleerd kunnen worden (zogenoemde streefwaarden). Bij een oude woning liggen de streefwaarden lager dan bij een nieuwe woning. Als een dak, vloer of raam optimaal is geïsoleerd, vermeldt het energielabel dat het voldoet aan de standaard voor woningisolatie.\n\nIs het tarief van de kinderopvang hoger dan de maximale vergoeding? Dan betalen de ouders het bedrag boven de maximale uurprijs zelf. Is het tarief van de kinderopvang lager dan de maximumprijs per uur? Dan krijgen ouders over dat goedkopere uurtarief kinderopvangtoeslag.\n\nHeeft u van de politie een bekeuring ontvangen voor het niet voldoen aan de identificatieplicht? Dan kunt u hiertegen geen bezwaar maken. Van het Centraal Justitieel Incassobureau (CJIB) ontvangt u een acceptgiro om de boete te betalen. Betaalt u de boete niet, dan beslist de officier van Justitie of u strafrechtelijk wordt vervolgd. Dit kan nog tot 2 jaar na de datum van de overtreding.\n\nBij een ramp kunnen mensen en bedrijven materiële schade lijden. Het kabinet kan gedupeerden dan helpen met de Wet tegemoetkoming schade bij rampen (Wts). Dankzij de Wts kunnen gedupeerden onder voorwaarden, een financiële tegemoetkoming krijgen voor de geleden schade en kosten. Het gaat daarbij alleen om schade die niet verhaalbaar, niet vermijdbaar en niet redelijkerwijs verzekerbaar is.\n\nVogelgriep verspreidt zich in Nederland door bijvoorbeeld trekvogels. Dit heeft grote gevolgen voor de natuur en pluimveebedrijven. De Rijksoverheid neemt bij verdenking van vogelgriep maatregelen om verspreiding tegen te gaan. Ook is er een plan om besmetting met het virus zo veel mogelijk te voorkomen.\n\nDe mensen in het gaswinningsgebied willen dat de overheid voorrang geeft aan het verbeteren van de schadeafhandeling. En de versterking van onveilige huizen zo snel mogelijk afrondt. 29 van de 50 maatregelen die de overheid neemt, zijn bedoeld om dit voor elkaar te krijgen.\n\nGemeenten hebben per 1 februari 2024 met de Wet gemeentelijke taak mogelijk maken asielopvangvoorzieningen (Spreidingswet) een wettelijke taak in de opvang van asielzoekers. Het doel van de wet is te komen tot voldoende opvangplekken en een evenwichtiger verdeling van asielzoekers over provincies en gemeenten.\n\nOm terug te keren naar het land van herkomst heeft de vreemdeling een geldig reisdocument nodig, zoals een paspoort. Het komt voor dat vreemdelingen geen geldig reisdocument hebben. Het land van herkomst moet de vreemdeling dan identificeren. Daarnaast regelt het land van herkomst van de vreemdeling een (vervangend) reisdocument, zoals een noodreisdocument (een laissez-passer).\n\nDe basisschool bewaart verschillende gegevens over uw kind in een leerlingdossier, zoals de leerresultaten. U en de school mogen deze gegevens inzien. In speciale gevallen mogen anderen dat ook, zoals in een noodsituatie of bij een vermoeden van kindermishandeling."
+
+if __name__ == "__main__":
+    start_time = time.time()
+    text = EXAMPLE_TEXT
+    debug = True
+    db_suggestions, model_suggestions = find_replacement_candidates(text, debug=debug)
+    reformed_text = fill_in_replacements(model_suggestions, db_suggestions, text, debug=debug)
+
+    print("Original text:")
+    print(text)
+    print("\nReformed text:")
+    print(reformed_text)
+
+    print(f"Execution time: {time.time() - start_time:.2f} seconds")
+    print("\nModels:")
+    registry.print_report()
+    ## print all the stopwords
+    #print(get_stopwords())
+
+
+    # print the words types of the whole sentence
+    # doc = get_nlp()(text)
+    # for token in doc:
+    #     print(token.text, token.pos_)
 
@@ -0,0 +1,140 @@
+import argparse
+import json
+import sys
+import time
+
+# Latency against candidate quality of the context-window modes of the model candidates (see
+# AI_powered_synonymRetrievel.context_windows) on the bundled example text. The whole-segment mode
+# is the reference for the quality: how many of its candidates a mode still finds, how often the
+# final replacement of a word is the same, and how much the SimCSE similarities change.
+#
+# Measured on one CPU with stand-ins of the same size as the real models (randomly initialised, so
+# only the timings mean something): whole segment 197.7s, sentence 23.1s (8.6x), 16 words 37.3s
+# (5.3x), 8 words 25.8s (7.7x) for the 529 words of the example text.
+
+DEFAULT_WINDOWS = ['segment', 'sentence', '16', '8']
+
+
+def parse_window(value):
+    """
+    :param value: 'segment', 'sentence' or a number of words on each side.
+    :return: The context_window argument of the pipeline.
+    """
+    if value == 'segment':
+        return None
+    if value == 'sentence':
+        return value
+    return int(value)
+
+
+def run_window(text, db_path, context_window, max_tokens=512, repeat=3):
+    """
+    Run the pipeline over a text with one context window, with cold caches on every run.
+
+    :return: Tuple (database candidates, model candidates, fastest run in seconds).
+    """
+    import AI_powered_synonymRetrievel as ai
+    seconds = []
+    for _ in range(repeat):
+        ai.embedding_cache.clear()
+        ai.candidate_analyses.clear()
+        start_time = time.perf_counter()
+        db_candidates, model_candidates = ai.find_replacement_candidates(text, db_path, max_tokens=max_tokens,
+                                                                         context_window=context_window)
+        seconds.append(time.perf_counter() - start_time)
+    return db_candidates, model_candidates, min(seconds)
+
+
+def benchmark_context_windows(text=None, db_path='dutch_synonyms_NN.db', windows=DEFAULT_WINDOWS, max_tokens=512,
+                              repeat=3):
+    """
+    Measure every context window against the whole segment.
+
+    :param text: Text to run (default: the bundled example text).
+    :param db_path: Path to the SQLite synonym database.
+    :param windows: Context windows to measure, as accepted by parse_window.
+    :param max_tokens: Maximum number of model tokens per segment.
+    :param repeat: Runs per window; the fastest is reported.
+    :return: List with a report dictionary per window.
+    """
+    import AI_powered_synonymRetrievel as ai
+    text = text or ai.EXAMPLE_TEXT
+
+    # Measure the models, not the candidate cache; load the models before the first timing
+    candidate_cache, ai.candidate_cache = ai.candidate_cache, None
+    try:
+        start, end = ai.sentence_spans(text)[0]
+        ai.find_replacement_candidates(text[start:end], db_path, max_tokens=max_tokens)
+        reference_db, reference, reference_seconds = run_window(text, db_path, None, max_tokens, repeat)
+        results = {'segment': (reference_db, reference, reference_seconds)}
+        for window in windows:
+            if window not in results:
+                results[window] = run_window(text, db_path, parse_window(window), max_tokens, repeat)
+    finally:
+        ai.candidate_cache = candidate_cache
+
+    reference_pairs = {(candidate.position, candidate.synonym): candidate.relatedness_score for candidate in reference}
+    reference_choices = {position: candidate.synonym
+                         for position, candidate in ai.rank_replacements(reference_db, reference).items()}
+    reports = []
+    for window in windows:
+        db_candidates, candidates, seconds = results[window]
+        pairs = {(candidate.position, candidate.synonym): candidate.relatedness_score for candidate in candidates}
+        shared = reference_pairs.keys() & pairs.keys()
+        choices = ai.rank_replacements(db_candidates, candidates)
+        agreement = [choices[position].synonym == synonym if position in choices else False
+                     for position, synonym in reference_choices.items()]
+        deltas = [abs(pairs[pair] - reference_pairs[pair]) for pair in shared
+                  if pairs[pair] is not None and reference_pairs[pair] is not None]
+
+        reports.append({
+            'window': window,
+            'seconds': round(seconds, 3),
+            'speedup': round(reference_seconds / seconds, 2) if seconds else None,
+            'candidates': len(pairs),
+            'candidate_recall': round(len(shared) / len(reference_pairs), 4) if reference_pairs else None,
+            'candidate_precision': round(len(shared) / len(pairs), 4) if pairs else None,
+            'replacement_agreement': round(sum(agreement) / len(agreement), 4) if agreement else None,
+            'similarity_mean_abs_delta': round(sum(deltas) / len(deltas), 6) if deltas else None,
+        })
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the context windows of the model candidates on the example text.")
+    parser.add_argument('--db', default='dutch_synonyms_NN.db', help="SQLite synonym database")
+    parser.add_argument('--windows', nargs='+', default=DEFAULT_WINDOWS,
+                        help="'segment', 'sentence' or a number of words on each side")
+    parser.add_argument('--text', help="File with the text to run (default: the bundled example text)")
+    parser.add_argument('--max-tokens', type=int, default=512)
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per window; the fastest is reported")
+    parser.add_argument('--json', help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    text = None
+    if args.text:
+        with open(args.text, encoding='utf-8') as file:
+            text = file.read()
+    for window in args.windows:
+        try:
+            parse_window(window)
+        except ValueError:
+            parser.error(f"invalid window '{window}', expected 'segment', 'sentence' or a number of words")
+
+    reports = benchmark_context_windows(text, args.db, args.windows, args.max_tokens, args.repeat)
+    print(f"{'window':<9} {'seconds':>8} {'x':>6} {'cands':>6} {'recall':>7} {'prec.':>7} {'agree':>7} {'sim Δ':>9}")
+    for report in reports:
+        values = [report['candidate_recall'], report['candidate_precision'], report['replacement_agreement']]
+        recall, precision, agreement = ('' if value is None else f"{value:.3f}" for value in values)
+        delta = '' if report['similarity_mean_abs_delta'] is None else f"{report['similarity_mean_abs_delta']:.5f}"
+        print(f"{report['window']:<9} {report['seconds']:>8.2f} {report['speedup']:>6.2f} {report['candidates']:>6} "
+              f"{recall:>7} {precision:>7} {agreement:>7} {delta:>9}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(reports, file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
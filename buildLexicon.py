@@ -0,0 +1,307 @@
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import createSynonymDictionary as csd
+import frozenLexicon
+
+# Non-interactive, staged build of a synonym database.
+#
+# Every stage records a fingerprint of its inputs (files, parameters and the fingerprints of the
+# stages it depends on) in the database. A stage only runs when that fingerprint changed.
+#
+# Stages that write the database run one at a time on the main thread: SQLite takes one writer at a
+# time, and spaCy only starts its worker processes (n_process) from the main thread. The stages
+# that only write other files (filter, freeze) run in worker threads, next to the writing stages.
+
+
+class Stage:
+    def __init__(self, name, deps, inputs, params, run, count_query, outputs=None, writes_db=True):
+        """
+        :param name: Name of the stage.
+        :param deps: Names of the stages that must finish first.
+        :param inputs: Function returning the input file paths for the build arguments.
+        :param params: Function returning the parameters that influence the output.
+        :param run: Function doing the work, called with the build arguments.
+        :param count_query: SQL query counting the rows the stage produced.
+        :param outputs: Function returning the files the stage writes besides the database; the
+                        stage runs again when one of them is missing.
+        :param writes_db: Whether the stage writes the database; such stages run on the main thread,
+                          one at a time.
+        """
+        self.name = name
+        self.deps = deps
+        self.inputs = inputs
+        self.params = params
+        self.run = run
+        self.count_query = count_query
+        self.outputs = outputs
+        self.writes_db = writes_db
+
+
+def run_filter(args):
+    with open(args.dictionary, 'r', encoding='utf-8') as file:
+        words = file.read().splitlines()
+    filtered_words = csd.filter_words(words, args.no_uppercase, args.allowed_special_chars)
+    with open(words_file(args), 'w', encoding='utf-8') as file:
+        file.write('\n'.join(filtered_words))
+    return len(filtered_words)
+
+
+def run_tag(args):
+    with open(words_file(args), 'r', encoding='utf-8') as file:
+        words = file.read().splitlines()
+    words_with_types = csd.categorize_words_in_batch(words, n_process=args.processes, cache_path=args.pos_cache)
+
+    conn = sqlite3.connect(args.db, timeout=csd.DB_TIMEOUT)
+    csd.create_tables(conn)
+    # A new word list invalidates everything derived from the old one
+    conn.execute('DELETE FROM synonyms')
+    conn.execute('DELETE FROM words')
+    conn.executemany('INSERT OR IGNORE INTO words (word, word_type) VALUES (?, ?)', words_with_types)
+    conn.commit()
+    conn.close()
+
+
+def run_link(args):
+    csd.reset_processed_and_synonyms(args.db, confirm=False)
+    csd.bulk_load_synonyms(args.db, args.dat)
+
+
+def run_sync(args):
+    csd.sync_words_and_synonyms(args.db, pos_cache=args.pos_cache)
+
+
+def run_score(args):
+    if args.frequencies:
+        csd.assign_frequency_scores(args.db, args.frequencies)
+    else:
+        csd.assign_simplicity_scores(args.db)
+
+
+def run_graph(args):
+    csd.build_synonym_graph(args.db, two_hop=args.two_hop, two_hop_decay=args.two_hop_decay,
+                            max_two_hop=args.max_two_hop)
+
+
+def run_forms(args):
+    csd.build_forms_table(args.db, args.forms, n_process=args.processes)
+
+
+def run_freeze(args):
+    words, _ = frozenLexicon.export_frozen_lexicon(args.db, frozen_file(args))
+    return words
+
+
+STAGES = [
+    Stage('filter', [],
+          lambda args: [args.dictionary],
+          lambda args: [args.no_uppercase, args.allowed_special_chars],
+          run_filter, None,
+          lambda args: [words_file(args)], writes_db=False),
+    Stage('tag', ['filter'],
+          lambda args: [],
+          lambda args: [csd.SPACY_MODEL],
+          run_tag, 'SELECT COUNT(*) FROM words'),
+    Stage('link', ['tag'],
+          lambda args: [args.dat],
+          lambda args: [],
+          run_link, 'SELECT COUNT(*) FROM synonyms'),
+    Stage('sync', ['link'],
+          lambda args: [],
+          lambda args: [csd.SPACY_MODEL],
+          run_sync, 'SELECT COUNT(*) FROM words'),
+    Stage('score', ['sync'],
+          lambda args: [args.frequencies] if args.frequencies else [],
+          lambda args: [],
+          run_score, 'SELECT COUNT(*) FROM words WHERE simplicity_score != 0.0'),
+    Stage('graph', ['sync'],
+          lambda args: [],
+          lambda args: [args.two_hop, args.two_hop_decay, args.max_two_hop],
+          run_graph, 'SELECT COUNT(*) FROM synonym_graph'),
+    Stage('forms', ['sync'],
+          lambda args: [args.forms],
+          lambda args: [csd.SPACY_MODEL],
+          run_forms, 'SELECT COUNT(*) FROM forms'),
+    Stage('freeze', ['score', 'graph'],
+          lambda args: [],
+          lambda args: [frozenLexicon.FROZEN_LEXICON_MAGIC.decode('ascii')],
+          run_freeze, None,
+          lambda args: [frozen_file(args)], writes_db=False),
+]
+
+
+def words_file(args):
+    """
+    :return: Path of the filtered word list written by the 'filter' stage.
+    """
+    return os.path.splitext(args.db)[0] + '.words.txt'
+
+
+def frozen_file(args):
+    """
+    :return: Path of the frozen lexicon written by the 'freeze' stage.
+    """
+    return args.frozen or os.path.splitext(args.db)[0] + '.lex'
+
+
+def fingerprint(stage, args, dep_fingerprints):
+    """
+    Fingerprint the inputs of a stage: input files (path, size, modification time), parameters and
+    the fingerprints of the stages it depends on.
+    """
+    digest = hashlib.sha256(stage.name.encode('utf-8'))
+    for path in stage.inputs(args):
+        stat = os.stat(path)
+        digest.update(f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}".encode('utf-8'))
+    digest.update(json.dumps(stage.params(args)).encode('utf-8'))
+    for dep in stage.deps:
+        digest.update(dep_fingerprints[dep].encode('utf-8'))
+    return digest.hexdigest()
+
+
+def open_state(db_path):
+    conn = sqlite3.connect(db_path, timeout=csd.DB_TIMEOUT)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS build_stages (
+            stage TEXT PRIMARY KEY,
+            fingerprint TEXT,
+            seconds REAL,
+            rows INTEGER,
+            finished_at TEXT
+        )
+    ''')
+    conn.commit()
+    return conn
+
+
+def run_stage(stage, args):
+    """
+    Run a single stage.
+
+    :return: Tuple (seconds, rows returned by the stage).
+    """
+    print(f"[{stage.name}] started")
+    start_time = time.time()
+    rows = stage.run(args)
+    return time.time() - start_time, rows
+
+
+def record_stage(stage, args, stage_fingerprint, seconds, rows):
+    """
+    Record the fingerprint, duration and row count of a finished stage. Called on the main thread,
+    so only one thread writes the database.
+
+    :return: Dictionary with the stage report.
+    """
+    conn = open_state(args.db)
+    if stage.count_query:
+        rows = conn.execute(stage.count_query).fetchone()[0]
+    conn.execute('INSERT OR REPLACE INTO build_stages VALUES (?, ?, ?, ?, ?)',
+                 (stage.name, stage_fingerprint, seconds, rows, time.strftime('%Y-%m-%d %H:%M:%S')))
+    conn.commit()
+    conn.close()
+    print(f"[{stage.name}] finished in {seconds:.2f}s ({rows} rows)")
+    return {'stage': stage.name, 'status': 'ran', 'seconds': round(seconds, 3), 'rows': rows}
+
+
+def build(args):
+    """
+    Run all stages in dependency order, skipping the ones whose inputs did not change.
+
+    :return: List of stage reports, in the order the stages finished.
+    """
+    conn = open_state(args.db)
+    previous = {stage: (stage_fingerprint, rows) for stage, stage_fingerprint, rows in
+                conn.execute('SELECT stage, fingerprint, rows FROM build_stages')}
+    conn.close()
+
+    pending = {stage.name: stage for stage in STAGES}
+    fingerprints = {}
+    report = []
+    running = {}
+    writers = []  # Ready stages that write the database, run in order on this thread
+
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        while pending or running or writers:
+            for name, stage in list(pending.items()):
+                if not all(dep in fingerprints for dep in stage.deps):
+                    continue
+                del pending[name]
+                stage_fingerprint = fingerprint(stage, args, fingerprints)
+                previous_fingerprint, previous_rows = previous.get(name, (None, None))
+                up_to_date = previous_fingerprint == stage_fingerprint
+                if stage.outputs:
+                    up_to_date = up_to_date and all(os.path.exists(path) for path in stage.outputs(args))
+                if up_to_date and not args.force:
+                    print(f"[{name}] up to date, skipped")
+                    fingerprints[name] = stage_fingerprint
+                    report.append({'stage': name, 'status': 'skipped', 'seconds': 0.0, 'rows': previous_rows})
+                    continue
+                if stage.writes_db:
+                    writers.append((stage, stage_fingerprint))
+                else:
+                    running[executor.submit(run_stage, stage, args)] = (stage, stage_fingerprint)
+
+            if writers:
+                stage, stage_fingerprint = writers.pop(0)
+                seconds, rows = run_stage(stage, args)
+                report.append(record_stage(stage, args, stage_fingerprint, seconds, rows))
+                fingerprints[stage.name] = stage_fingerprint
+                done = [future for future in running if future.done()]
+            elif running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+            else:
+                continue
+            for future in done:
+                stage, stage_fingerprint = running.pop(future)
+                seconds, rows = future.result()  # Re-raises the error of a failed stage
+                report.append(record_stage(stage, args, stage_fingerprint, seconds, rows))
+                fingerprints[stage.name] = stage_fingerprint
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a synonym database without interaction.")
+    parser.add_argument('--db', default='dutch_synonyms.db', help="Database to build or update")
+    parser.add_argument('--dictionary', default='OpenTaal-210G-woordenlijsten/OpenTaal-210G-basis-gekeurd.txt')
+    parser.add_argument('--dat', default='sym_database/th_nl_v2.dat', help="Thesaurus .dat file")
+    parser.add_argument('--forms', default='OpenTaal-210G-woordenlijsten/OpenTaal-210G-flexievormen.txt')
+    parser.add_argument('--frequencies', help="word<TAB>frequency file for the scores (default: length heuristic)")
+    parser.add_argument('--pos-cache', default=csd.DEFAULT_POS_CACHE)
+    parser.add_argument('--frozen', help="Frozen lexicon to write (default: <db>.lex)")
+    parser.add_argument('--no-two-hop', dest='two_hop', action='store_false', help="Only symmetric edges in the graph")
+    parser.add_argument('--two-hop-decay', type=float, default=0.5)
+    parser.add_argument('--max-two-hop', type=int, default=10, help="Two-hop neighbours kept per word")
+    parser.add_argument('--allow-uppercase', dest='no_uppercase', action='store_false')
+    parser.add_argument('--allowed-special-chars', default="'-")
+    parser.add_argument('--processes', type=int, default=None, help="SpaCy worker processes (default: automatic)")
+    parser.add_argument('--workers', type=int, default=2, help="Threads for the stages that do not write the database")
+    parser.add_argument('--force', action='store_true', help="Run all stages, even if their inputs did not change")
+    parser.add_argument('--report', help="Write the stage report as JSON to this file")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    report = build(args)
+    total = time.time() - start_time
+
+    print(f"\n{'stage':<8} {'status':<8} {'seconds':>9} {'rows':>9}")
+    for entry in report:
+        rows = '' if entry['rows'] is None else entry['rows']
+        print(f"{entry['stage']:<8} {entry['status']:<8} {entry['seconds']:>9.2f} {rows:>9}")
+    print(f"Total build time: {total:.2f}s")
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as file:
+            json.dump({'db': args.db, 'total_seconds': round(total, 3), 'stages': report}, file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,260 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Persistent cache of the scored model candidates of a word in its context.
+#
+# Government and news pages repeat the same sentences, so the masked language model, the POS checks
+# and the SimCSE scores of a word in a context already seen are read from the cache instead. The
+# entries are stored in a SQLite file, with an in-memory LRU in front of it. When the file holds
+# more than max_bytes of candidates, the least recently used entries are deleted.
+#
+# The lock only guards the in-memory state, so memory hits never wait for the file. The file is read
+# and written through one connection shared by all threads, under its own lock (db_lock); SQLite
+# runs one statement per connection at a time anyway. Hits are recorded in memory and their
+# last-used times written to the file in batches.
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_MEMORY_ENTRIES = 10000
+DEFAULT_FLUSH_EVERY = 256  # Hits between two writes of the last-used times
+
+
+def normalize_window(text):
+    """
+    :return: The text with all whitespace runs collapsed to one space, so layout does not change the key.
+    """
+    return ' '.join(text.split())
+
+
+def context_key(window, word_index, versions):
+    """
+    :param window: Text the models saw.
+    :param word_index: Index of the target word among the \\w+ words of the window.
+    :param versions: Anything identifying the models and settings the candidates were produced with.
+    :return: Cache key (hex digest).
+    """
+    data = json.dumps([normalize_window(window), word_index, versions], ensure_ascii=False)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+
+class CandidateCache:
+    def __init__(self, path=None, max_bytes=DEFAULT_MAX_BYTES, max_memory_entries=DEFAULT_MAX_MEMORY_ENTRIES,
+                 flush_every=DEFAULT_FLUSH_EVERY):
+        """
+        :param path: SQLite file to store the entries in, or None to only keep them in memory.
+                     The file is created on first use.
+        :param max_bytes: Maximum total size of the stored candidates in the file.
+        :param max_memory_entries: Maximum number of entries in the in-memory LRU.
+        :param flush_every: Number of hits after which their last-used times are written to the file.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_memory_entries = max_memory_entries
+        self.flush_every = flush_every
+        self.lock = threading.Lock()
+        self.db_lock = threading.Lock()
+        self.conn = None
+        self.memory = OrderedDict()
+        self.touched = {}
+        self.size = 0
+        self.evicting = False
+        self.hits = 0
+        self.memory_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _connection(self):
+        # Called with db_lock held
+        conn = self.conn
+        if conn is None:
+            # Autocommit; writes open their own transaction
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS candidate_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_used REAL NOT NULL
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_candidate_cache_last_used ON candidate_cache (last_used)")
+            size = conn.execute("SELECT COALESCE(SUM(size), 0) FROM candidate_cache").fetchone()[0]
+            with self.lock:
+                self.size = size
+            self.conn = conn
+        return conn
+
+    def _remember(self, key, value):
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_memory_entries:
+            self.memory.popitem(last=False)
+
+    def _touch(self, key):
+        # Called with the lock held; returns whether the last-used times are due to be written
+        self.touched[key] = time.time()
+        return self.path is not None and len(self.touched) >= self.flush_every
+
+    def get(self, key):
+        """
+        :return: The cached value, or None when the key is not in the cache.
+        """
+        with self.lock:
+            value = self.memory.get(key)
+            if value is not None:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                self.memory_hits += 1
+                flush = self._touch(key)
+            elif self.path is None:
+                self.misses += 1
+                return None
+        if value is None:
+            with self.db_lock:
+                row = self._connection().execute("SELECT value FROM candidate_cache WHERE key = ?", (key,)).fetchone()
+            with self.lock:
+                if row is None:
+                    self.misses += 1
+                    return None
+                value = json.loads(row[0])
+                self._remember(key, value)
+                self.hits += 1
+                flush = self._touch(key)
+        if flush:
+            self.flush()
+        return value
+
+    def put(self, key, value):
+        """
+        Store a JSON serializable value.
+        """
+        with self.lock:
+            self._remember(key, value)
+            self.touched.pop(key, None)
+        if self.path is None:
+            return
+        data = json.dumps(value, ensure_ascii=False)
+        with self.db_lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                previous = conn.execute("SELECT size FROM candidate_cache WHERE key = ?", (key,)).fetchone()
+                conn.execute("INSERT OR REPLACE INTO candidate_cache (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                             (key, data, len(data), time.time()))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            with self.lock:
+                self.size += len(data) - (previous[0] if previous else 0)
+
+        with self.lock:
+            evict = self.size > self.max_bytes and not self.evicting
+            self.evicting = self.evicting or evict
+        if evict:
+            try:
+                self.flush()
+                self._evict()
+            finally:
+                with self.lock:
+                    self.evicting = False
+
+    def flush(self):
+        """
+        Write the last-used times of the entries hit since the previous flush to the file.
+        """
+        with self.lock:
+            touched, self.touched = self.touched, {}
+        if self.path is None or not touched:
+            return
+        with self.db_lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany("UPDATE candidate_cache SET last_used = ? WHERE key = ?",
+                                 [(last_used, key) for key, last_used in touched.items()])
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _evict(self):
+        # Delete the least recently used entries until the file is back at 90% of its budget
+        with self.db_lock:
+            with self.lock:
+                excess = self.size - self.max_bytes * 0.9
+            conn = self._connection()
+            freed = []
+            freed_bytes = 0
+            cursor = conn.execute("SELECT key, size FROM candidate_cache ORDER BY last_used")
+            for key, size in cursor:
+                if freed_bytes >= excess:
+                    break
+                freed.append(key)
+                freed_bytes += size
+            cursor.close()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany("DELETE FROM candidate_cache WHERE key = ?", [(key,) for key in freed])
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            with self.lock:
+                self.size -= freed_bytes
+        with self.lock:
+            for key in freed:
+                self.memory.pop(key, None)
+                self.touched.pop(key, None)
+            self.evictions += len(freed)
+
+    def clear(self):
+        """
+        Remove all entries and reset the counters.
+        """
+        with self.lock:
+            self.memory.clear()
+            self.touched.clear()
+            self.hits = self.memory_hits = self.misses = self.evictions = 0
+        if self.path is not None:
+            with self.db_lock:
+                self._connection().execute("DELETE FROM candidate_cache")
+                with self.lock:
+                    self.size = 0
+
+    def stats(self):
+        """
+        :return: Dictionary with the hit, miss and eviction counters and the cache sizes.
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {'hits': self.hits, 'memory_hits': self.memory_hits, 'misses': self.misses,
+                    'hit_rate': self.hits / lookups if lookups else 0.0, 'evictions': self.evictions,
+                    'memory_entries': len(self.memory), 'stored_bytes': self.size}
+
+    def close(self):
+        """
+        Write the pending last-used times and close the connection; it is opened again on next use.
+        """
+        self.flush()
+        with self.db_lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+
+def open_candidate_cache():
+    """
+    :return: CandidateCache stored at CANDIDATE_CACHE_PATH (default model_candidates_cache.db), kept
+             in memory only when the variable is empty, or None when it is 'off'.
+    """
+    path = os.environ.get('CANDIDATE_CACHE_PATH', 'model_candidates_cache.db')
+    if path == 'off':
+        return None
+    max_bytes = int(os.environ.get('CANDIDATE_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+    return CandidateCache(path or None, max_bytes=max_bytes)
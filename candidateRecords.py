@@ -0,0 +1,92 @@
+# Typed replacement candidates, passed from lookup to replacement without string round trips.
+#
+# The `|`/`;` separated format is only produced and parsed at the wire boundary, by
+# encode_candidates and decode_candidates.
+
+NONE = "NONE"
+
+
+class Candidate:
+    """
+    Replacement candidate for the word at a position in the text.
+
+    :param position: Index of the word in the text (counting \\w+ words).
+    :param word: The (lemmatized) word at that position.
+    :param simplicity_score: Simplicity score of the word.
+    :param synonym: Replacement, or None when the word has no synonyms in the database.
+    :param synonym_simplicity_score: Simplicity score of the replacement.
+    :param relatedness_score: Relatedness score (database) or sentence similarity (model).
+    :param source: 'db' or 'model'.
+    """
+    __slots__ = ('position', 'word', 'simplicity_score', 'synonym', 'synonym_simplicity_score',
+                 'relatedness_score', 'source')
+
+    def __init__(self, position, word, simplicity_score, synonym=None, synonym_simplicity_score=None,
+                 relatedness_score=None, source='db'):
+        self.position = position
+        self.word = word
+        self.simplicity_score = simplicity_score
+        self.synonym = synonym
+        self.synonym_simplicity_score = synonym_simplicity_score
+        self.relatedness_score = relatedness_score
+        self.source = source
+
+    def __repr__(self):
+        return (f"Candidate({self.position}, {self.word!r}, {self.simplicity_score}, {self.synonym!r}, "
+                f"{self.synonym_simplicity_score}, {self.relatedness_score}, {self.source!r})")
+
+    def __eq__(self, other):
+        if not isinstance(other, Candidate):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in self.__slots__)
+
+
+def encode_candidate(candidate, debug=False):
+    """
+    :return: "position|simplicity_score|synonym|synonym_simplicity_score|relatedness_score", prefixed
+             with "word|" when debug is True; a candidate without synonym is encoded with NONE fields.
+    """
+    if candidate.synonym is None:
+        fields = [candidate.position, candidate.simplicity_score, NONE, NONE, NONE]
+    else:
+        fields = [candidate.position, candidate.simplicity_score, candidate.synonym,
+                  candidate.synonym_simplicity_score, candidate.relatedness_score]
+    if debug:
+        fields.insert(0, candidate.word)
+    return "|".join(str(field) for field in fields)
+
+
+def encode_candidates(candidates, debug=False):
+    """
+    :param candidates: Iterable of Candidate records.
+    :param debug: Prefix every entry with the word.
+    :return: The candidates encoded with encode_candidate, separated by semicolons.
+    """
+    return ";".join(encode_candidate(candidate, debug) for candidate in candidates)
+
+
+def _parse_score(value):
+    return None if value in (NONE, "None") else float(value)
+
+
+def decode_candidates(text, source='db'):
+    """
+    Parse a string produced by encode_candidates. Entries with and without the debug word prefix
+    are told apart by their number of fields.
+
+    :param text: Semicolon separated candidates.
+    :param source: Source recorded in the returned records.
+    :return: List of Candidate records.
+    """
+    candidates = []
+    for entry in text.split(";"):
+        if not entry:
+            continue
+        parts = entry.split("|")
+        word = parts.pop(0) if len(parts) == 6 else None
+        position, simplicity_score, synonym, synonym_simplicity_score, relatedness_score = parts
+        candidates.append(Candidate(int(position), word, _parse_score(simplicity_score),
+                                    None if synonym == NONE else synonym,
+                                    _parse_score(synonym_simplicity_score), _parse_score(relatedness_score),
+                                    source))
+    return candidates
@@ -0,0 +1,67 @@
+import argparse
+import os
+import subprocess
+import sys
+
+# Measures the cost of importing the library modules with `python -X importtime`, each in a fresh
+# interpreter, and fails when a module exceeds its budget or pulls in a model framework at import.
+
+MODULES = ['AI_powered_synonymRetrievel', 'getSynonymsDB', 'lexiconCache', 'connectionPool', 'modelRegistry', 'candidateCache']
+
+# Milliseconds of cumulative import time allowed per module
+DEFAULT_BUDGET_MS = 150
+
+# Heavy packages that must only be imported when a model is first used
+LAZY_PACKAGES = ['torch', 'transformers', 'sentence_transformers', 'spacy', 'onnxruntime']
+
+
+def measure_import(module, python=sys.executable):
+    """
+    Import a module in a fresh interpreter with `-X importtime`.
+
+    :param module: Name of the module to import.
+    :param python: Python executable to use.
+    :return: Tuple (cumulative import time of the module in ms, dictionary of imported module -> cumulative ms).
+    """
+    result = subprocess.run([python, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr.strip().splitlines()[-1]}")
+
+    imported = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        imported[name.strip()] = int(cumulative) / 1000
+    return imported.get(module, 0.0), imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the import time of the library modules.")
+    parser.add_argument('modules', nargs='*', default=MODULES, help="Modules to check (default: the library modules)")
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS, help="Allowed import time per module")
+    parser.add_argument('--top', type=int, default=5, help="Number of slowest imports to list per module")
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.modules:
+        total_ms, imported = measure_import(module)
+        eager = sorted(name for name in imported if name.split('.')[0] in LAZY_PACKAGES)
+        over_budget = total_ms > args.budget_ms
+        failed = failed or over_budget or bool(eager)
+
+        status = 'FAIL' if over_budget or eager else 'ok'
+        print(f"{module}: {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms) {status}")
+        for name, ms in sorted(imported.items(), key=lambda item: -item[1])[1:args.top + 1]:
+            print(f"    {ms:8.1f} ms  {name}")
+        if eager:
+            print(f"    imported at module level: {', '.join(eager)}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
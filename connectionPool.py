@@ -0,0 +1,211 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from urllib.parse import quote
+
+# Pool of read-only connections to a synonym database, shared by concurrent request handlers.
+#
+# A thread keeps the same connection for nested use; the pool never opens more than `size`
+# connections, so a handler waits when all of them are in use. Handlers should hold a connection
+# only while they query: cursor() gives a cursor that borrows one for every statement.
+#
+# A mode=ro connection keeps reading the file it opened, also after that file was replaced (e.g. by
+# a rebuild moved in place); reset() makes the pool open new connections to the current file.
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_MMAP_SIZE = 256 * 1024 * 1024
+DEFAULT_CACHED_STATEMENTS = 256
+
+
+class ReadOnlyConnectionPool:
+    def __init__(self, db_path, size=DEFAULT_POOL_SIZE, mmap_size=DEFAULT_MMAP_SIZE,
+                 cached_statements=DEFAULT_CACHED_STATEMENTS, timeout=30.0):
+        """
+        :param db_path: Path to the SQLite database.
+        :param size: Maximum number of open connections.
+        :param mmap_size: Bytes of the database file SQLite may memory-map per connection.
+        :param cached_statements: Number of prepared statements cached per connection.
+        :param timeout: Seconds to wait for a free connection (and for locks) before failing.
+        """
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(f"Database {db_path} does not exist.")
+        self.db_path = db_path
+        self.size = size
+        self.mmap_size = mmap_size
+        self.cached_statements = cached_statements
+        self.timeout = timeout
+        self.idle = queue.LifoQueue()
+        self.opened = 0
+        self.generation = 0
+        self.generations = {}  # Connection -> generation of the pool it was opened in
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.closed = False
+
+    def _open(self):
+        uri = f"file:{quote(os.path.abspath(self.db_path))}?mode=ro"
+        # Connections move between threads through the pool, but are only used by one at a time
+        conn = sqlite3.connect(uri, uri=True, timeout=self.timeout, check_same_thread=False,
+                               cached_statements=self.cached_statements)
+        conn.execute(f'PRAGMA mmap_size = {int(self.mmap_size)}')
+        conn.execute('PRAGMA query_only = ON')
+        return conn
+
+    def _discard(self, conn):
+        conn.close()
+        with self.lock:
+            self.opened -= 1
+            self.generations.pop(conn, None)
+
+    def _current(self, conn):
+        return not self.closed and self.generations.get(conn) == self.generation
+
+    def acquire(self):
+        """
+        Take a connection from the pool, opening a new one while fewer than `size` are open.
+        Prefer connection(), which also returns the connection.
+
+        :return: SQLite connection.
+        """
+        if self.closed:
+            raise RuntimeError("Connection pool is closed.")
+        while True:
+            try:
+                conn = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            if self._current(conn):
+                return conn
+            self._discard(conn)
+        with self.lock:
+            if self.opened < self.size:
+                self.opened += 1
+                generation = self.generation
+                try:
+                    conn = self._open()
+                except Exception:
+                    self.opened -= 1
+                    raise
+                self.generations[conn] = generation
+                return conn
+        try:
+            conn = self.idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No free connection to {self.db_path} within {self.timeout}s.") from None
+        if self._current(conn):
+            return conn
+        # Opened before a reset: replace it by a connection to the current file
+        self._discard(conn)
+        return self.acquire()
+
+    def release(self, conn):
+        """
+        Return a connection taken with acquire() to the pool.
+        """
+        if not self._current(conn):
+            self._discard(conn)
+            return
+        self.idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager lending a connection; nested use in the same thread gets the same connection.
+
+        :return: SQLite connection.
+        """
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None:
+            self.local.depth += 1
+            try:
+                yield conn
+            finally:
+                self.local.depth -= 1
+            return
+
+        conn = self.acquire()
+        self.local.conn, self.local.depth = conn, 1
+        try:
+            yield conn
+        finally:
+            self.local.conn = None
+            self.release(conn)
+
+    def cursor(self):
+        """
+        :return: PooledCursor on this pool.
+        """
+        return PooledCursor(self)
+
+    def _drain(self):
+        while True:
+            try:
+                conn = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+    def reset(self):
+        """
+        Reopen the connections, so they read the database file as it is now. Idle connections are
+        closed right away, connections in use when they are released.
+        """
+        with self.lock:
+            self.generation += 1
+        self._drain()
+
+    def close(self):
+        """
+        Close the idle connections; connections still in use are closed when they are released.
+        """
+        self.closed = True
+        self._drain()
+
+
+class PooledCursor:
+    """
+    Cursor that borrows a connection from a pool for every statement and returns it right after, so
+    it can be kept for a whole request without holding a connection while the request does other
+    work. The rows of a statement are fetched when it runs.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.rows = []
+
+    def execute(self, sql, parameters=()):
+        with self.pool.connection() as conn:
+            self.rows = conn.execute(sql, parameters).fetchall()
+        return self
+
+    def fetchone(self):
+        return self.rows.pop(0) if self.rows else None
+
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+
+pools = {}
+pools_lock = threading.Lock()
+
+
+def get_pool(db_path, **kwargs):
+    """
+    Return the shared read-only pool for a database, creating it on first use.
+
+    :param db_path: Path to the SQLite database.
+    :param kwargs: Passed to ReadOnlyConnectionPool() when the pool is created.
+    :return: ReadOnlyConnectionPool instance.
+    """
+    key = os.path.abspath(db_path)
+    with pools_lock:
+        pool = pools.get(key)
+        if pool is None or pool.closed:
+            pool = pools[key] = ReadOnlyConnectionPool(db_path, **kwargs)
+        return pool
@@ -0,0 +1,294 @@
+import argparse
+import array
+import math
+import mmap
+import os
+import sqlite3
+import sys
+import threading
+import zlib
+
+# Immutable, memory-mapped export of a synonym database for read-heavy serving.
+#
+# The file is written once and only read afterwards: every worker process that opens it maps the
+# same pages, so N workers share one physical copy. A lookup hashes the word into an open-addressing
+# table of string ids and compares it with the string in the mapped file; the arrays are read in place.
+
+FROZEN_LEXICON_MAGIC = b'FRZLEX02'
+HEADER_FIELDS = 6  # string count, word count, edge count, hash slot count, string blob size, POS table size
+EMPTY_SLOT = 0xFFFFFFFF
+
+
+def _padding(size):
+    return b'\0' * (-size % 8)
+
+
+def string_hash(key):
+    """
+    :return: Hash of a UTF-8 string in the hash table (CRC-32, the same in every process).
+    """
+    return zlib.crc32(key)
+
+
+def export_frozen_lexicon(db_path, output_path):
+    """
+    Compile the 'words' table and the synonyms (from 'synonym_graph' when it exists, otherwise
+    'synonyms') into one immutable binary file.
+
+    Layout (native byte order, every section padded to 8 bytes): magic, header of HEADER_FIELDS
+    uint64, then
+      string offsets   uint32, strings + 1   offsets of the UTF-8 strings in the blob
+      string -> word   int32, strings        word index of a string, -1 if it is not in 'words'
+      word ids         uint32, words         string id of every word, ascending
+      simplicity       float32, words        simplicity score (NaN for NULL)
+      pos codes        uint8, words          index into the POS table (0 for none)
+      row pointers     uint32, words + 1     CSR offsets of each word's synonyms in the edge arrays
+      edge synonyms    uint32, edges         string id of the synonym
+      edge relatedness float32, edges        relatedness score (NaN for NULL)
+      hash slots       uint32, slots         string id per slot (EMPTY_SLOT if free), linear probing
+                                             from string_hash(string) % slots; slots is a power of two
+                                             of at least twice the number of strings
+      POS table        UTF-8, newline separated
+      string blob      UTF-8 strings sorted bytewise, back to back
+
+    The file is written next to output_path and moved in place, so workers that mapped the previous
+    version keep reading a consistent copy.
+
+    :param db_path: Path to the SQLite synonym database.
+    :param output_path: Path of the frozen lexicon to write.
+    :return: Tuple (number of words, number of synonym edges).
+    """
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'synonym_graph'")
+    table = 'synonym_graph' if cursor.fetchone() else 'synonyms'
+
+    cursor.execute("SELECT word, simplicity_score, word_type FROM words")
+    words = {word: (simplicity_score, word_type) for word, simplicity_score, word_type in cursor.fetchall()}
+    cursor.execute(f"SELECT word, synonym, relatedness_score FROM {table} ORDER BY word, synonym")
+    edges = [(word, synonym, relatedness_score) for word, synonym, relatedness_score in cursor.fetchall()
+             if word in words]
+    conn.close()
+
+    # Intern every word and synonym once, sorted bytewise so string ids follow the sort order
+    strings = sorted({word.encode('utf-8') for word in words} |
+                     {synonym.encode('utf-8') for _, synonym, _ in edges})
+    string_ids = {string.decode('utf-8'): string_id for string_id, string in enumerate(strings)}
+    word_ids = array.array('I', sorted(string_ids[word] for word in words))
+    word_index = {strings[string_id].decode('utf-8'): i for i, string_id in enumerate(word_ids)}
+
+    string_offsets = array.array('I', [0])
+    for string in strings:
+        string_offsets.append(string_offsets[-1] + len(string))
+    string_word = array.array('i', [-1]) * len(strings)
+    for i, string_id in enumerate(word_ids):
+        string_word[string_id] = i
+
+    pos_table = [''] + sorted({word_type for _, word_type in words.values() if word_type})
+    pos_codes = {word_type: code for code, word_type in enumerate(pos_table)}
+    simplicity = array.array('f', [math.nan]) * len(word_ids)
+    pos = array.array('B', [0]) * len(word_ids)
+    for word, (simplicity_score, word_type) in words.items():
+        i = word_index[word]
+        if simplicity_score is not None:
+            simplicity[i] = simplicity_score
+        pos[i] = pos_codes.get(word_type, 0)
+
+    # CSR adjacency: the synonyms of word i are edges row_pointers[i]:row_pointers[i + 1]
+    edges.sort(key=lambda edge: (word_index[edge[0]], string_ids[edge[1]]))
+    row_pointers = array.array('I', [0]) * (len(word_ids) + 1)
+    for word, _, _ in edges:
+        row_pointers[word_index[word] + 1] += 1
+    for i in range(len(word_ids)):
+        row_pointers[i + 1] += row_pointers[i]
+    edge_synonyms = array.array('I', (string_ids[synonym] for _, synonym, _ in edges))
+    edge_relatedness = array.array('f', (math.nan if relatedness_score is None else relatedness_score
+                                         for _, _, relatedness_score in edges))
+
+    slot_count = 1 << (2 * len(strings)).bit_length()
+    slots = array.array('I', [EMPTY_SLOT]) * slot_count
+    for string_id, string in enumerate(strings):
+        slot = string_hash(string) & (slot_count - 1)
+        while slots[slot] != EMPTY_SLOT:
+            slot = (slot + 1) & (slot_count - 1)
+        slots[slot] = string_id
+
+    blob = b''.join(strings)
+    pos_blob = '\n'.join(pos_table).encode('utf-8')
+    sections = [string_offsets, string_word, word_ids, simplicity, pos, row_pointers,
+                edge_synonyms, edge_relatedness, slots]
+
+    temp_path = output_path + '.tmp'
+    with open(temp_path, 'wb') as file:
+        file.write(FROZEN_LEXICON_MAGIC)
+        file.write(array.array('Q', [len(strings), len(word_ids), len(edges), slot_count, len(blob),
+                                     len(pos_blob)]).tobytes())
+        for section in sections:
+            data = section.tobytes()
+            file.write(data + _padding(len(data)))
+        file.write(pos_blob + _padding(len(pos_blob)))
+        file.write(blob)
+    os.replace(temp_path, output_path)
+    return len(word_ids), len(edges)
+
+
+class FrozenLexicon:
+    """
+    Read-only, memory-mapped view of a frozen lexicon.
+
+    Offers the lookups of lexiconCache.Lexicon (`in`, simplicity_score, synonyms and entries), so it
+    can be passed wherever a lexicon is accepted. A lookup hashes the word once and compares it with
+    the strings of its hash slots through a memoryview of the mapped file, without copying them; all
+    arrays are read in place.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            self._mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:8] != FROZEN_LEXICON_MAGIC:
+            self._mm.close()
+            raise ValueError(f"{path} is not a frozen lexicon of this version; export it again.")
+
+        view = memoryview(self._mm)
+        header_end = 8 + 8 * HEADER_FIELDS
+        n_strings, n_words, n_edges, slot_count, blob_size, pos_size = view[8:header_end].cast('Q')
+        self._count = n_words
+        self._slot_mask = slot_count - 1
+
+        offset = header_end
+        self._views = []
+
+        def section(fmt, count, itemsize):
+            nonlocal offset
+            size = count * itemsize
+            section_view = view[offset:offset + size].cast(fmt)
+            offset += size + (-size % 8)
+            self._views.append(section_view)
+            return section_view
+
+        self._string_offsets = section('I', n_strings + 1, 4)
+        self._string_word = section('i', n_strings, 4)
+        self._word_ids = section('I', n_words, 4)
+        self._simplicity = section('f', n_words, 4)
+        self._pos = section('B', n_words, 1)
+        self._row_pointers = section('I', n_words + 1, 4)
+        self._edge_synonyms = section('I', n_edges, 4)
+        self._edge_relatedness = section('f', n_edges, 4)
+        self._slots = section('I', slot_count, 4)
+        self.pos_table = bytes(view[offset:offset + pos_size]).decode('utf-8').split('\n')
+        offset += pos_size + (-pos_size % 8)
+        self._blob = section('B', blob_size, 1)
+        view.release()
+
+    def _string(self, string_id):
+        return str(self._blob[self._string_offsets[string_id]:self._string_offsets[string_id + 1]], 'utf-8')
+
+    def _find(self, word):
+        """
+        :return: Word index of the word, or -1 if it is not a word of the lexicon.
+        """
+        key = word.encode('utf-8')
+        slot = string_hash(key) & self._slot_mask
+        while True:
+            string_id = self._slots[slot]
+            if string_id == EMPTY_SLOT:
+                return -1
+            start, end = self._string_offsets[string_id], self._string_offsets[string_id + 1]
+            if end - start == len(key) and self._blob[start:end] == key:
+                return self._string_word[string_id]
+            slot = (slot + 1) & self._slot_mask
+
+    @staticmethod
+    def _score(value):
+        return None if math.isnan(value) else value
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, word):
+        return self._find(word) >= 0
+
+    def simplicity_score(self, word):
+        """
+        :return: Simplicity score of the word (float32 precision), or None if it is not in the lexicon.
+        """
+        i = self._find(word)
+        return self._score(self._simplicity[i]) if i >= 0 else None
+
+    def word_type(self, word):
+        """
+        :return: POS tag of the word, or None if it is unknown or the word is not in the lexicon.
+        """
+        i = self._find(word)
+        return self.pos_table[self._pos[i]] or None if i >= 0 else None
+
+    def _synonyms(self, i):
+        synonyms = []
+        for edge in range(self._row_pointers[i], self._row_pointers[i + 1]):
+            string_id = self._edge_synonyms[edge]
+            synonym_index = self._string_word[string_id]
+            synonyms.append((self._string(string_id),
+                             self._score(self._simplicity[synonym_index]) if synonym_index >= 0 else None,
+                             self._score(self._edge_relatedness[edge])))
+        return synonyms
+
+    def synonyms(self, word):
+        """
+        :return: List of (synonym, synonym_simplicity_score, relatedness_score) tuples for the word.
+        """
+        i = self._find(word)
+        return self._synonyms(i) if i >= 0 else []
+
+    def entries(self, words):
+        """
+        :param words: Iterable of words.
+        :return: Dictionary word -> (simplicity_score, [(synonym, synonym_simplicity_score, relatedness_score), ...])
+                 for the words in the lexicon.
+        """
+        entries = {}
+        for word in set(words):
+            i = self._find(word)
+            if i >= 0:
+                entries[word] = (self._score(self._simplicity[i]), self._synonyms(i))
+        return entries
+
+    def close(self):
+        for section_view in self._views:
+            section_view.release()
+        self._mm.close()
+
+
+frozen_lexicons = {}
+frozen_lexicons_lock = threading.Lock()
+
+
+def get_frozen_lexicon(path):
+    """
+    Return the shared frozen lexicon for a file, mapping it on first use.
+
+    :param path: Path to a frozen lexicon written by export_frozen_lexicon.
+    :return: FrozenLexicon instance.
+    """
+    key = os.path.abspath(path)
+    with frozen_lexicons_lock:
+        lexicon = frozen_lexicons.get(key)
+        if lexicon is None:
+            lexicon = frozen_lexicons[key] = FrozenLexicon(path)
+        return lexicon
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a synonym database to a frozen, memory-mapped lexicon.")
+    parser.add_argument('db', help="SQLite synonym database")
+    parser.add_argument('output', nargs='?', help="Frozen lexicon to write (default: <db>.lex)")
+    args = parser.parse_args()
+
+    output = args.output or os.path.splitext(args.db)[0] + '.lex'
+    words, edges = export_frozen_lexicon(args.db, output)
+    print(f"Wrote {output}: {words} words, {edges} synonym edges, {os.path.getsize(output)} bytes.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
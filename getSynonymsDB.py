@@ -1,6 +1,7 @@
 import sqlite3
 import re
-import spacy
+from lexiconCache import get_lexicon
+from candidateRecords import Candidate, encode_candidates
 def open_database(db_path):
     """
     Open a connection to the SQLite database.
@@ -20,16 +21,56 @@ def fetch_words(cursor):
     cursor.execute('SELECT word FROM words')
     return cursor.fetchall()
 
-def fetch_synonyms(cursor, word):
+def synonym_table(cursor):
+    """
+    Pick the table to read synonyms from: the materialized synonym graph (symmetric and two-hop
+    edges) when it has been built, the plain 'synonyms' table otherwise.
+    :param cursor: SQLite cursor.
+    :return: Table name.
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'synonym_graph'")
+    return 'synonym_graph' if cursor.fetchone() else 'synonyms'
+
+def fetch_synonyms(cursor, word, table='synonyms'):
     """
     Fetch all synonyms for a given word from the 'synonyms' table in the database.
     :param cursor: SQLite cursor.
     :param word: Word for which to fetch synonyms.
+    :param table: Table to read from ('synonyms' or 'synonym_graph').
     :return: List of synonyms for the given word.
     """
-    cursor.execute('SELECT synonym FROM synonyms WHERE word = ?', (word,))
+    cursor.execute(f'SELECT synonym FROM {table} WHERE word = ?', (word,))
     return cursor.fetchall()
 
+def fetch_word_entries(cursor, words, table='synonyms', chunk_size=900):
+    """
+    Resolve words, their simplicity scores and all their synonyms with simplicity and relatedness
+    scores in one joined query (per chunk of words).
+    :param cursor: SQLite cursor.
+    :param words: Iterable of words.
+    :param table: Table to read synonyms from ('synonyms' or 'synonym_graph').
+    :param chunk_size: Number of words per IN (...) query, below SQLite's variable limit.
+    :return: Dictionary word -> (simplicity_score, [(synonym, synonym_simplicity_score, relatedness_score), ...])
+             for the words in the database.
+    """
+    words = list(set(words))
+    entries = {}
+    for i in range(0, len(words), chunk_size):
+        chunk = words[i:i + chunk_size]
+        cursor.execute(f'''
+            SELECT w.word, w.simplicity_score, s.synonym, sw.simplicity_score, s.relatedness_score
+            FROM words w
+            LEFT JOIN {table} s ON s.word = w.word
+            LEFT JOIN words sw ON sw.word = s.synonym
+            WHERE w.word IN ({', '.join('?' * len(chunk))})
+            ORDER BY w.word, s.synonym
+        ''', chunk)
+        for word, simplicity_score, synonym, synonym_simplicity_score, relatedness_score in cursor.fetchall():
+            synonyms = entries.setdefault(word, (simplicity_score, []))[1]
+            if synonym is not None:
+                synonyms.append((synonym, synonym_simplicity_score, relatedness_score))
+    return entries
+
 def close_database(conn):
     """
     Close the SQLite database connection.
@@ -37,10 +78,18 @@ def close_database(conn):
     """
     conn.close()
     
-def extract_word_scores_and_synonyms(text, debug=False):
-    # Open database connection
-    db_path = 'dutch_synonyms_NN.db'
-    conn, cursor = open_database(db_path)
+def find_db_candidates(text, db_path='dutch_synonyms_NN.db', debug=False, lexicon=None):
+    """
+    Look up the synonyms of every word in a text.
+    :param text: Text to find replacements for.
+    :param db_path: Path to the SQLite synonym database.
+    :param debug: Print the words that are not in the database.
+    :param lexicon: Lexicon serving the lookups instead of the database, e.g. a frozenLexicon.FrozenLexicon.
+    :return: List of Candidate records; a word without synonyms gets a single record without synonym.
+    """
+    # Words, scores and synonym lists are served from the shared in-memory lexicon of the database
+    if lexicon is None:
+        lexicon = get_lexicon(db_path)
 
     # Tokenize the text into words, preserving word positions
     words = re.findall(r'\w+', text)
@@ -50,68 +99,51 @@ def extract_word_scores_and_synonyms(text, debug=False):
 
     result = []
 
-    # Fetch all words from the database for lookup
-    db_words = {word[0] for word in fetch_words(cursor)}  # Convert list of tuples to set of words for fast lookup
+    # Fetch the words of the text with their synonyms and all scores in one batched lookup
+    entries = lexicon.entries(words)
 
     # Iterate through each word in the text
     for position, word in word_positions.items():
-        if word in db_words:  # If the word exists in the database
-            # Fetch simplicity score for the word
-            cursor.execute("SELECT simplicity_score FROM words WHERE word = ?", (word,))
-            complex_simplicity_score = cursor.fetchone()[0]
-
-            # Fetch synonyms and relatedness scores
-            synonyms = fetch_synonyms(cursor, word)
+        if word in entries:  # If the word exists in the database
+            complex_simplicity_score, synonyms = entries[word]
 
             if synonyms:  # If synonyms are found
-                for synonym_tuple in synonyms:
-                    synonym = synonym_tuple[0]
-                    # Fetch simplicity score and relatedness score for each synonym
-                    cursor.execute("SELECT simplicity_score FROM words WHERE word = ?", (synonym,))
-                    synonym_simplicity_score = cursor.fetchone()[0]
-
-                    cursor.execute("SELECT relatedness_score FROM synonyms WHERE word = ? AND synonym = ?", (word, synonym))
-                    relatedness_score = cursor.fetchone()[0]
-
-                    # Format with | separators; put original word first if debug=True
-                    if debug:
-                        result.append(f"{word}|{position}|{complex_simplicity_score}|{synonym}|{synonym_simplicity_score}|{relatedness_score}")
-                    else:
-                        result.append(f"{position}|{complex_simplicity_score}|{synonym}|{synonym_simplicity_score}|{relatedness_score}")
+                for synonym, synonym_simplicity_score, relatedness_score in synonyms:
+                    result.append(Candidate(position, word, complex_simplicity_score, synonym,
+                                            synonym_simplicity_score, relatedness_score, 'db'))
             else:  # No synonyms found
-                if debug:
-                    result.append(f"{word}|{position}|{complex_simplicity_score}|NONE|NONE|NONE")
-                else:
-                    result.append(f"{position}|{complex_simplicity_score}|NONE|NONE|NONE")
+                result.append(Candidate(position, word, complex_simplicity_score, source='db'))
         else:
             # Word is not in the database, consider it as non-complex and skip
             if debug:
                 print(f"Word '{word}' not found in the database, skipping...")
             continue
-            
-
-    # Close the database connection
-    close_database(conn)
-
-    # Return the result in the required format, separated by semicolons
-    return ";".join(result)
-
-# Load the large Dutch language model
-nlp = spacy.load("nl_core_news_lg")
-
-# Example input text
-text = "De gecompliceerde infrastructuur van de metropool vereist een systematische analyse door deskundigen."
-
-# Unlemmatized version
-print("Unlemmatized input:")
-response_unlemmatized = extract_word_scores_and_synonyms(text, debug=True)
-for i in response_unlemmatized.split(";"):
-    print(i)
 
-# Lemmatized version
-print("\nLemmatized input:")
-lemmatized_words = [token.lemma_ for token in nlp(text)]
-lemmatized_text = " ".join(lemmatized_words)
-response_lemmatized = extract_word_scores_and_synonyms(lemmatized_text, debug=True)
-for i in response_lemmatized.split(";"):
-    print(i)
\ No newline at end of file
+    return result
+
+def extract_word_scores_and_synonyms(text, debug=False, lexicon=None):
+    # Return the result in the required format: "|" separated fields, put original word first if
+    # debug=True, entries separated by semicolons
+    return encode_candidates(find_db_candidates(text, debug=debug, lexicon=lexicon), debug)
+
+if __name__ == "__main__":
+    # Load the large Dutch language model
+    import spacy
+    nlp = spacy.load("nl_core_news_lg")
+
+    # Example input text
+    text = "De gecompliceerde infrastructuur van de metropool vereist een systematische analyse door deskundigen."
+
+    # Unlemmatized version
+    print("Unlemmatized input:")
+    response_unlemmatized = extract_word_scores_and_synonyms(text, debug=True)
+    for i in response_unlemmatized.split(";"):
+        print(i)
+
+    # Lemmatized version
+    print("\nLemmatized input:")
+    lemmatized_words = [token.lemma_ for token in nlp(text)]
+    lemmatized_text = " ".join(lemmatized_words)
+    response_lemmatized = extract_word_scores_and_synonyms(lemmatized_text, debug=True)
+    for i in response_lemmatized.split(";"):
+        print(i)
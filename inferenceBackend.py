@@ -0,0 +1,293 @@
+import argparse
+import gc
+import json
+import os
+import re
+import shutil
+import sys
+import time
+
+from modelRegistry import MLM_MODEL, SIMCSE_MODEL, current_rss
+
+# Pluggable CPU inference backends for the transformer models:
+#   fp32  the PyTorch models as published
+#   int8  PyTorch with dynamic int8 quantization of the Linear layers
+#   onnx  an exported ONNX Runtime graph (needs `optimum[onnxruntime]`)
+# The backend is chosen once at startup, with the INFERENCE_BACKEND environment variable or
+# set_backend(), before the first model is loaded. A model is exported to ONNX once, into
+# ONNX_CACHE_DIR, and later loads (other processes, or after an eviction) read the exported graph.
+
+BACKENDS = ['fp32', 'int8', 'onnx']
+DEFAULT_BACKEND = os.environ.get('INFERENCE_BACKEND', 'fp32')
+ONNX_CACHE_DIR = os.environ.get('ONNX_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'onnx_models'))
+
+backend = DEFAULT_BACKEND
+
+# Fixed Dutch sentences for the parity check between backends
+TEST_CORPUS = [
+    "In Nederland is het niet verboden om een product onder de inkoopprijs te verkopen.",
+    "Vooral supermarkten verkopen soms hun producten onder de inkoopprijs.",
+    "Het energielabel geeft aan hoe goed een woning is geïsoleerd.",
+    "Bij een oude woning liggen de streefwaarden lager dan bij een nieuwe woning.",
+    "Is het tarief van de kinderopvang hoger dan de maximale vergoeding?",
+    "Van het Centraal Justitieel Incassobureau ontvangt u een acceptgiro om de boete te betalen.",
+    "Het kabinet kan gedupeerden dan helpen met de Wet tegemoetkoming schade bij rampen.",
+    "De Rijksoverheid neemt bij verdenking van vogelgriep maatregelen om verspreiding tegen te gaan.",
+    "Het doel van de wet is te komen tot voldoende opvangplekken voor asielzoekers.",
+    "De basisschool bewaart verschillende gegevens over uw kind in een leerlingdossier.",
+]
+
+
+def set_backend(name):
+    """
+    Select the inference backend for the models loaded from now on.
+
+    :param name: One of BACKENDS.
+    """
+    global backend
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}', expected one of {', '.join(BACKENDS)}.")
+    backend = name
+
+
+def _require_onnx():
+    try:
+        import optimum.onnxruntime  # noqa: F401
+    except ImportError:
+        raise ImportError("The 'onnx' inference backend needs optimum with ONNX Runtime: "
+                          "pip install optimum[onnxruntime]") from None
+
+
+def onnx_export_dir(model_name):
+    """
+    :return: Directory the ONNX export of a model is kept in.
+    """
+    return os.path.join(ONNX_CACHE_DIR, model_name.replace('/', '--'))
+
+
+def load_exported(model_name, load, export):
+    """
+    Load a model's ONNX export from the cache, exporting and saving it on first use. The export is
+    saved to a temporary directory and moved in place, so a directory in the cache is always complete.
+
+    :param model_name: Hugging Face model name.
+    :param load: Function loading the model from a saved export directory.
+    :param export: Function exporting the model from the Hugging Face model; the result has save_pretrained().
+    :return: The loaded model.
+    """
+    export_dir = onnx_export_dir(model_name)
+    if os.path.isdir(export_dir):
+        return load(export_dir)
+
+    model = export()
+    temp_dir = f"{export_dir}.tmp-{os.getpid()}"
+    model.save_pretrained(temp_dir)
+    try:
+        os.replace(temp_dir, export_dir)
+    except OSError:
+        # Another process saved the same export first
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return model
+
+
+def quantize(model):
+    """
+    Dynamically quantize the Linear layers of a PyTorch model to int8.
+    """
+    import torch
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def load_mask_model(model_name, backend_name=None):
+    """
+    Load a masked language model with the selected backend.
+
+    :param model_name: Hugging Face model name.
+    :param backend_name: Backend to use (default: the one selected at startup).
+    :return: Tuple (tokenizer, model); the model is called as model(**inputs) and returns logits.
+    """
+    from transformers import AutoTokenizer
+    backend_name = backend_name or backend
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    if backend_name == 'onnx':
+        _require_onnx()
+        from optimum.onnxruntime import ORTModelForMaskedLM
+        return tokenizer, load_exported(model_name, ORTModelForMaskedLM.from_pretrained,
+                                        lambda: ORTModelForMaskedLM.from_pretrained(model_name, export=True))
+
+    from transformers import AutoModelForMaskedLM
+    model = AutoModelForMaskedLM.from_pretrained(model_name).eval()
+    if backend_name == 'int8':
+        model = quantize(model)
+    return tokenizer, model
+
+
+def load_sentence_model(model_name, backend_name=None):
+    """
+    Load a SentenceTransformer model with the selected backend.
+
+    :param model_name: Hugging Face model name.
+    :param backend_name: Backend to use (default: the one selected at startup).
+    :return: SentenceTransformer model.
+    """
+    from sentence_transformers import SentenceTransformer
+    backend_name = backend_name or backend
+    if backend_name == 'onnx':
+        _require_onnx()
+        return load_exported(model_name, lambda export_dir: SentenceTransformer(export_dir, backend='onnx'),
+                             lambda: SentenceTransformer(model_name, backend='onnx'))
+
+    model = SentenceTransformer(model_name)
+    if backend_name == 'int8':
+        model = quantize(model)
+    return model
+
+
+def _corpus_targets(corpus):
+    """
+    :return: List of (sentence, rows) with a TokenRow for every word of at least four letters.
+    """
+    from AI_powered_synonymRetrievel import TokenRow
+    targets = []
+    for sentence in corpus:
+        rows = [TokenRow(position, match.group(), match.group().lower(), None, match.start(), match.end())
+                for position, match in enumerate(re.finditer(r'\w+', sentence)) if len(match.group()) >= 4]
+        targets.append((sentence, rows))
+    return targets
+
+
+def _similarities(model, sentence, modified_sentences):
+    import numpy as np
+    embeddings = model.encode([sentence] + modified_sentences, convert_to_numpy=True)
+    embeddings = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+    return (embeddings[1:] @ embeddings[0]).tolist()
+
+
+def run_backend(backend_name, targets, top_k=5, replacements=None):
+    """
+    Load the masked language and SimCSE models with one backend and run them over the test corpus.
+
+    :param backend_name: Backend to measure.
+    :param targets: Output of _corpus_targets.
+    :param top_k: Predictions per masked word.
+    :param replacements: Per sentence, the sentences with a word replaced, scored for similarity
+                         (default: the top-1 predictions of this backend).
+    :return: Dictionary with the predictions, similarities, load time, memory and latency.
+    """
+    from AI_powered_synonymRetrievel import predict_masked_words
+
+    gc.collect()
+    rss_before = current_rss()
+    start_time = time.perf_counter()
+    mask_model = load_mask_model(MLM_MODEL, backend_name)
+    sentence_model = load_sentence_model(SIMCSE_MODEL, backend_name)
+    load_seconds = time.perf_counter() - start_time
+    rss_loaded = current_rss()
+
+    # Warm up once, so the timings below do not include one-off initialisation
+    predict_masked_words(targets[0][0], targets[0][1][:1], top_k, mask_model=mask_model)
+
+    start_time = time.perf_counter()
+    predictions = [predict_masked_words(sentence, rows, top_k, mask_model=mask_model) for sentence, rows in targets]
+    mlm_seconds = time.perf_counter() - start_time
+
+    if replacements is None:
+        replacements = [[sentence[:row.start] + words[0] + sentence[row.end:]
+                         for row, words in zip(rows, sentence_predictions) if words]
+                        for (sentence, rows), sentence_predictions in zip(targets, predictions)]
+    start_time = time.perf_counter()
+    similarities = [_similarities(sentence_model, sentence, modified)
+                    for (sentence, _), modified in zip(targets, replacements)]
+    simcse_seconds = time.perf_counter() - start_time
+
+    result = {
+        'backend': backend_name,
+        'load_seconds': round(load_seconds, 3),
+        'memory_mb': round((rss_loaded - rss_before) / 2 ** 20, 1),
+        'mlm_seconds': round(mlm_seconds, 3),
+        'simcse_seconds': round(simcse_seconds, 3),
+        'predictions': predictions,
+        'replacements': replacements,
+        'similarities': similarities,
+    }
+    del mask_model, sentence_model
+    gc.collect()
+    return result
+
+
+def compare_backends(backends=BACKENDS, corpus=TEST_CORPUS, top_k=5):
+    """
+    Accuracy-parity check of the backends against fp32 on a fixed corpus: how much the top-k masked
+    language model candidates and the SimCSE similarities change, next to the latency and memory.
+    The similarities of every backend are computed for the same sentences (built from the fp32
+    top-1 candidates).
+
+    :param backends: Backends to compare; fp32 is always measured as the reference.
+    :param corpus: List of sentences.
+    :param top_k: Predictions per masked word.
+    :return: List with a report dictionary per backend.
+    """
+    targets = _corpus_targets(corpus)
+    reference = run_backend('fp32', targets, top_k)
+    reports = []
+    for backend_name in backends:
+        if backend_name == 'fp32':
+            result = reference
+        else:
+            try:
+                result = run_backend(backend_name, targets, top_k, reference['replacements'])
+            except ImportError as error:
+                reports.append({'backend': backend_name, 'error': str(error)})
+                continue
+
+        overlaps, top1, deltas = [], [], []
+        for sentence_predictions, reference_predictions in zip(result['predictions'], reference['predictions']):
+            for words, reference_words in zip(sentence_predictions, reference_predictions):
+                overlaps.append(len(set(words) & set(reference_words)) / top_k)
+                top1.append(bool(words) and bool(reference_words) and words[0] == reference_words[0])
+        for scores, reference_scores in zip(result['similarities'], reference['similarities']):
+            deltas.extend(abs(score - reference_score) for score, reference_score in zip(scores, reference_scores))
+
+        reports.append({
+            'backend': backend_name,
+            'topk_overlap': round(sum(overlaps) / len(overlaps), 4) if overlaps else None,
+            'top1_agreement': round(sum(top1) / len(top1), 4) if top1 else None,
+            'similarity_mean_abs_delta': round(sum(deltas) / len(deltas), 6) if deltas else None,
+            'similarity_max_abs_delta': round(max(deltas), 6) if deltas else None,
+            'mlm_seconds': result['mlm_seconds'],
+            'mlm_speedup': round(reference['mlm_seconds'] / result['mlm_seconds'], 2) if result['mlm_seconds'] else None,
+            'simcse_seconds': result['simcse_seconds'],
+            'simcse_speedup': round(reference['simcse_seconds'] / result['simcse_seconds'], 2) if result['simcse_seconds'] else None,
+            'load_seconds': result['load_seconds'],
+            'memory_mb': result['memory_mb'],
+        })
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the inference backends against fp32 on a fixed Dutch corpus.")
+    parser.add_argument('--backends', nargs='+', default=BACKENDS, choices=BACKENDS)
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--json', help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    reports = compare_backends(args.backends, top_k=args.top_k)
+    print(f"{'backend':<8} {'top-k':>7} {'top-1':>7} {'sim Δ mean':>11} {'sim Δ max':>10} "
+          f"{'MLM s':>7} {'x':>6} {'SimCSE s':>9} {'x':>6} {'MB':>8}")
+    for report in reports:
+        if 'error' in report:
+            print(f"{report['backend']:<8} {report['error']}")
+            continue
+        print(f"{report['backend']:<8} {report['topk_overlap']:>7.3f} {report['top1_agreement']:>7.3f} "
+              f"{report['similarity_mean_abs_delta']:>11.5f} {report['similarity_max_abs_delta']:>10.5f} "
+              f"{report['mlm_seconds']:>7.2f} {report['mlm_speedup']:>6.2f} {report['simcse_seconds']:>9.2f} "
+              f"{report['simcse_speedup']:>6.2f} {report['memory_mb']:>8.1f}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(reports, file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
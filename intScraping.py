@@ -178,16 +178,18 @@ def assign_simplicity_scores(db_path, scraper_data):
     # Calculate total frequency from the scraper to normalize scores
     total_frequency = sum(frequency for word, frequency in scraper_data)
 
-    # Assign simplicity scores based on frequency
-    for word, frequency in scraper_data:
-        # Check if the word exists in the database
-        cursor.execute('SELECT word FROM words WHERE word = ?', (word,))
-        result = cursor.fetchone()
-        
-        if result:
-            # Simplicity score based on frequency, normalized between 0 and 1
-            simplicity_score = frequency # / total_frequency  # Normalization
-            cursor.execute('UPDATE words SET simplicity_score = ? WHERE word = ?', (simplicity_score, word))
+    # Stage the scores in a temporary table; a later entry for the same word wins
+    # Simplicity score based on frequency (normalization: frequency / total_frequency)
+    cursor.execute('CREATE TEMP TABLE scraped_scores (word TEXT PRIMARY KEY, simplicity_score REAL)')
+    cursor.executemany('INSERT OR REPLACE INTO scraped_scores (word, simplicity_score) VALUES (?, ?)',
+                       scraper_data)
+    
+    # Assign simplicity scores to the words that exist in the database in one statement
+    cursor.execute('''
+        UPDATE words
+        SET simplicity_score = (SELECT s.simplicity_score FROM scraped_scores s WHERE s.word = words.word)
+        WHERE word IN (SELECT word FROM scraped_scores)
+    ''')
     
     conn.commit()
     conn.close()
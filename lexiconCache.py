@@ -0,0 +1,210 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from connectionPool import get_pool
+
+# Process-wide, in-memory view of a synonym database.
+#
+# The words and their simplicity scores are loaded once; synonym lists are loaded on first use and
+# kept in a bounded LRU. Lookups of loaded entries need no SQL. The cache reloads itself when the
+# database file changes on disk, or when invalidate() is called; both also reopen the pooled
+# connections, which would otherwise keep reading a file that was replaced.
+#
+# The lock only guards the dictionaries: queries run without it, so lookups of several threads read
+# the database concurrently and a thread never waits for a pooled connection while holding the lock.
+
+DEFAULT_MAX_SYNONYM_LISTS = 20000
+
+
+def file_signature(db_path):
+    """
+    :return: Inode, size and modification time of a database file and its write-ahead log; a file
+             replaced by another one has a new inode.
+    """
+    signature = []
+    for path in (db_path, db_path + '-wal'):
+        try:
+            stat = os.stat(path)
+            signature.append((stat.st_ino, stat.st_size, stat.st_mtime_ns))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+
+class Lexicon:
+    def __init__(self, db_path, max_synonym_lists=DEFAULT_MAX_SYNONYM_LISTS, check_interval=1.0, chunk_size=900):
+        """
+        :param db_path: Path to the SQLite synonym database.
+        :param max_synonym_lists: Maximum number of synonym lists kept in memory.
+        :param check_interval: Minimum number of seconds between two checks of the database file.
+        :param chunk_size: Number of words per IN (...) query when loading synonym lists.
+        """
+        self.db_path = db_path
+        self.max_synonym_lists = max_synonym_lists
+        self.check_interval = check_interval
+        self.chunk_size = chunk_size
+        self.lock = threading.RLock()
+        self.words = {}
+        self.synonym_lists = OrderedDict()
+        self.table = 'synonyms'
+        self.signature = None
+        self.generation = 0
+        self.checked_at = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def _file_signature(self):
+        return file_signature(self.db_path)
+
+    def load(self):
+        """
+        (Re)load all words and their simplicity scores and empty the synonym list cache.
+        """
+        signature = self._file_signature()
+        with get_pool(self.db_path).connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT word, simplicity_score FROM words")
+            words = dict(cursor.fetchall())
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'synonym_graph'")
+            table = 'synonym_graph' if cursor.fetchone() else 'synonyms'
+
+        with self.lock:
+            # The dictionary is replaced, not updated, so lookups in progress keep a consistent copy
+            self.words = words
+            self.table = table
+            self.synonym_lists.clear()
+            self.signature = signature
+            self.generation += 1
+            self.checked_at = time.monotonic()
+
+    def invalidate(self):
+        """
+        Drop the cached data and reopen the pooled connections; the data is reloaded from the
+        database file as it is now on the next lookup.
+        """
+        with self.lock:
+            self.signature = None
+        get_pool(self.db_path).reset()
+
+    def refresh(self):
+        """
+        Reload the cache if it was invalidated or the database file changed since it was loaded.
+        The file is checked at most once per check_interval seconds.
+        """
+        with self.lock:
+            if self.signature is not None:
+                now = time.monotonic()
+                if now - self.checked_at < self.check_interval:
+                    return
+                self.checked_at = now
+                signature = self.signature
+            else:
+                signature = None
+        if signature is None:
+            self.load()
+        elif self._file_signature() != signature:
+            # The pooled connections still read the file they opened, which may have been replaced
+            get_pool(self.db_path).reset()
+            self.load()
+
+    def __contains__(self, word):
+        self.refresh()
+        return word in self.words
+
+    def simplicity_score(self, word):
+        """
+        :return: Simplicity score of the word, or None if it is not in the database.
+        """
+        self.refresh()
+        return self.words.get(word)
+
+    def synonyms(self, word):
+        """
+        :return: List of (synonym, synonym_simplicity_score, relatedness_score) tuples for the word.
+        """
+        return self.entries([word]).get(word, (None, []))[1]
+
+    def entries(self, words):
+        """
+        Resolve words, their simplicity scores and all their synonyms with simplicity and relatedness
+        scores. Synonym lists that are not cached yet are loaded with one query per chunk of words.
+
+        :param words: Iterable of words.
+        :return: Dictionary word -> (simplicity_score, [(synonym, synonym_simplicity_score, relatedness_score), ...])
+                 for the words in the database; a synonym missing from 'words' has a score of None.
+        """
+        self.refresh()
+        with self.lock:
+            known_words, table, generation = self.words, self.table, self.generation
+            words = [word for word in set(words) if word in known_words]
+            missing = []
+            synonym_lists = {}
+            for word in words:
+                synonym_list = self.synonym_lists.get(word)
+                if synonym_list is None:
+                    missing.append(word)
+                else:
+                    self.synonym_lists.move_to_end(word)
+                    synonym_lists[word] = synonym_list
+            self.hits += len(words) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            loaded = self._load_synonym_lists(missing, table)
+            synonym_lists.update(loaded)
+            with self.lock:
+                # Lists read before a reload are not cached
+                if self.generation == generation:
+                    self.synonym_lists.update(loaded)
+                    while len(self.synonym_lists) > self.max_synonym_lists:
+                        self.synonym_lists.popitem(last=False)
+
+        return {word: (known_words[word],
+                       [(synonym, known_words.get(synonym), relatedness_score)
+                        for synonym, relatedness_score in synonym_lists[word]])
+                for word in words}
+
+    def _load_synonym_lists(self, words, table):
+        loaded = {word: [] for word in words}
+        with get_pool(self.db_path).connection() as conn:
+            cursor = conn.cursor()
+            for i in range(0, len(words), self.chunk_size):
+                chunk = words[i:i + self.chunk_size]
+                cursor.execute(f'''
+                    SELECT word, synonym, relatedness_score FROM {table}
+                    WHERE word IN ({', '.join('?' * len(chunk))})
+                    ORDER BY word, synonym
+                ''', chunk)
+                for word, synonym, relatedness_score in cursor.fetchall():
+                    loaded[word].append((synonym, relatedness_score))
+        return loaded
+
+    def stats(self):
+        """
+        :return: Dictionary with the number of cached words and synonym lists and the cache hits and misses.
+        """
+        with self.lock:
+            return {'words': len(self.words), 'synonym_lists': len(self.synonym_lists),
+                    'hits': self.hits, 'misses': self.misses}
+
+
+lexicons = {}
+lexicons_lock = threading.Lock()
+
+
+def get_lexicon(db_path, **kwargs):
+    """
+    Return the shared lexicon for a database, creating it on first use.
+
+    :param db_path: Path to the SQLite synonym database.
+    :param kwargs: Passed to Lexicon() when the lexicon is created.
+    :return: Lexicon instance.
+    """
+    key = os.path.abspath(db_path)
+    with lexicons_lock:
+        lexicon = lexicons.get(key)
+        if lexicon is None:
+            lexicon = lexicons[key] = Lexicon(db_path, **kwargs)
+        return lexicon
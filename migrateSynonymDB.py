@@ -0,0 +1,170 @@
+import argparse
+import glob
+import sqlite3
+import sys
+
+# Schema migrations for the synonym databases, applied in order.
+# The version of a database is stored in SQLite's `user_version` pragma.
+MIGRATIONS = [
+    (1, "Index synonyms and make (word, synonym) unique", [
+        # Duplicate pairs would block the unique index; keep the first inserted row
+        '''DELETE FROM synonyms
+           WHERE id NOT IN (SELECT MIN(id) FROM synonyms GROUP BY word, synonym)''',
+        'CREATE UNIQUE INDEX IF NOT EXISTS idx_synonyms_word_synonym ON synonyms (word, synonym)',
+        # Covering index for the hot lookup: all synonyms and relatedness scores of a word
+        'CREATE INDEX IF NOT EXISTS idx_synonyms_lookup ON synonyms (word, synonym, relatedness_score)',
+        # Used by the sync step (DISTINCT synonym) and reverse lookups
+        'CREATE INDEX IF NOT EXISTS idx_synonyms_synonym ON synonyms (synonym)',
+        # Lets the synonym build find the remaining unprocessed words without a table scan
+        'CREATE INDEX IF NOT EXISTS idx_words_unprocessed ON words (word) WHERE processed = 0',
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+# Queries on the request and build paths that must be answered from an index
+HOT_QUERIES = [
+    ('SELECT word FROM words WHERE processed = 0', ()),
+    ('SELECT simplicity_score FROM words WHERE word = ?', ('woord',)),
+    ('SELECT synonym FROM synonyms WHERE word = ?', ('woord',)),
+    ('SELECT synonym, relatedness_score FROM synonyms WHERE word = ?', ('woord',)),
+    ('SELECT relatedness_score FROM synonyms WHERE word = ? AND synonym = ?', ('woord', 'term')),
+    ('''SELECT DISTINCT s.synonym
+        FROM synonyms s LEFT JOIN words w ON w.word = s.synonym
+        WHERE w.word IS NULL''', ()),
+]
+
+
+def _lookup_queries(table):
+    # The lookups the lexicon and the request path run against a synonym table, with two words
+    # standing in for the chunks of IN (...) placeholders
+    return [
+        (f'SELECT synonym FROM {table} WHERE word = ?', ('woord',)),
+        (f'''SELECT word, synonym, relatedness_score FROM {table}
+             WHERE word IN (?, ?)
+             ORDER BY word, synonym''', ('woord', 'term')),
+        (f'''SELECT w.word, w.simplicity_score, s.synonym, sw.simplicity_score, s.relatedness_score
+             FROM words w
+             LEFT JOIN {table} s ON s.word = w.word
+             LEFT JOIN words sw ON sw.word = s.synonym
+             WHERE w.word IN (?, ?)''', ('woord', 'term')),
+    ]
+
+
+HOT_QUERIES += _lookup_queries('synonyms')
+
+# Hot queries on tables built by later steps (see buildLexicon), checked when the table exists
+OPTIONAL_HOT_QUERIES = {
+    'synonym_graph': _lookup_queries('synonym_graph'),
+    'forms': [
+        ('SELECT form, lemma, pos FROM forms WHERE form IN (?, ?)', ('woorden', 'termen')),
+    ],
+}
+
+
+def get_schema_version(conn):
+    """
+    :param conn: SQLite connection.
+    :return: Schema version of the database (0 for a database that was never migrated).
+    """
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn):
+    """
+    Apply all pending migrations to an open database. Each migration runs in its own transaction,
+    so an interrupted upgrade leaves the database at the last completed version.
+
+    :param conn: SQLite connection to a database containing the 'words' and 'synonyms' tables.
+    :return: List of the versions that were applied.
+    """
+    applied = []
+    current = get_schema_version(conn)
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None  # Manage the transactions explicitly, DDL included
+    try:
+        for version, description, statements in MIGRATIONS:
+            if version <= current:
+                continue
+            print(f"Applying migration {version}: {description}")
+            conn.execute('BEGIN')
+            try:
+                for statement in statements:
+                    conn.execute(statement)
+                conn.execute(f'PRAGMA user_version = {version}')
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            applied.append(version)
+    finally:
+        conn.isolation_level = isolation_level
+    return applied
+
+
+def migrate_database(db_path):
+    """
+    Upgrade a synonym database file in place to the latest schema version.
+
+    :param db_path: Path to the SQLite database.
+    :return: List of the versions that were applied.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        return migrate(conn)
+    finally:
+        conn.close()
+
+
+def check_query_plans(conn):
+    """
+    Verify that none of the hot queries falls back to a full table scan. The queries on the
+    synonym graph and the forms table are only checked when those tables exist.
+
+    A scan over a (covering) index is accepted, as it never reads the table itself.
+
+    :param conn: SQLite connection.
+    :return: List of (query, plan detail) tuples for the queries that scan a table.
+    """
+    tables = {name for name, in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    queries = HOT_QUERIES + [query for table, table_queries in OPTIONAL_HOT_QUERIES.items() if table in tables
+                             for query in table_queries]
+    failures = []
+    for query, params in queries:
+        for row in conn.execute(f'EXPLAIN QUERY PLAN {query}', params):
+            detail = row[-1]
+            if detail.startswith('SCAN') and 'INDEX' not in detail:
+                failures.append((' '.join(query.split()), detail))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upgrade synonym databases to the latest schema.")
+    parser.add_argument('databases', nargs='*', help="Database files (default: dutch_synonyms*.db)")
+    parser.add_argument('--check', action='store_true', help="Only check the query plans of the hot queries")
+    args = parser.parse_args()
+
+    databases = args.databases or sorted(glob.glob('dutch_synonyms*.db'))
+    if not databases:
+        print("No databases found.")
+        return 1
+
+    failed = False
+    for db_path in databases:
+        conn = sqlite3.connect(db_path)
+        try:
+            if not args.check:
+                applied = migrate(conn)
+                print(f"{db_path}: schema version {get_schema_version(conn)}"
+                      f"{' (applied ' + ', '.join(map(str, applied)) + ')' if applied else ' (up to date)'}")
+            for query, detail in check_query_plans(conn):
+                failed = True
+                print(f"{db_path}: query falls back to a scan ({detail}): {query}")
+        finally:
+            conn.close()
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+import gc
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# Registry of the models used by the pipeline. Every model is declared once here and loaded on
+# first use. With a memory budget, the least recently used models are evicted to stay within it.
+#
+# The budget applies to the memory the models take, measured as the growth of the process' resident
+# set size (RSS) while each model loads. It is set with the MODEL_MEMORY_BUDGET_MB environment
+# variable or ModelRegistry.budget_mb; without a budget nothing is evicted.
+#
+# The registry lock is only held for bookkeeping. A model loads under its own lock, so other threads
+# keep getting the loaded models meanwhile, and a model requested by several threads loads once.
+# Models that load at the same time are both charged for the RSS growth during their loads.
+
+SPACY_MODEL = "nl_core_news_lg"  # SpaCy Dutch language model for lemmatization
+MLM_MODEL = "wietsedv/bert-base-dutch-cased"  # BERTje masked language model
+SIMCSE_MODEL = "paraphrase-xlm-r-multilingual-v1"  # Multilingual SimCSE model
+SIMILARITY_MODEL = "DTAI-KULeuven/robbert-2023-dutch-base"  # RobBERT sentence pair classifier
+
+DEFAULT_BUDGET_MB = float(os.environ['MODEL_MEMORY_BUDGET_MB']) if os.environ.get('MODEL_MEMORY_BUDGET_MB') else None
+
+
+def current_rss():
+    """
+    :return: Resident set size of this process in bytes (peak RSS where /proc is not available).
+    """
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+
+class ModelRegistry:
+    def __init__(self, budget_mb=None):
+        """
+        :param budget_mb: Memory budget for the loaded models in MB, or None for no limit.
+        """
+        self.budget_mb = budget_mb
+        self.loaders = {}
+        self.loading_locks = {}
+        self.descriptions = {}
+        self.loaded = OrderedDict()  # Least recently used first
+        self.stats = {}
+        self.lock = threading.RLock()
+
+    def register(self, name, loader, description=''):
+        """
+        Declare a model.
+
+        :param name: Name the model is requested by.
+        :param loader: Function without arguments loading the model.
+        :param description: Shown in the report.
+        """
+        with self.lock:
+            self.loaders[name] = loader
+            self.loading_locks[name] = threading.Lock()
+            self.descriptions[name] = description
+            self.stats[name] = {'loads': 0, 'evictions': 0, 'load_seconds': None, 'memory_bytes': None}
+
+    def get(self, name):
+        """
+        Return a model, loading it on first use (or after it was evicted).
+
+        :param name: Name of a registered model.
+        :return: The loaded model.
+        """
+        with self.lock:
+            if name in self.loaded:
+                self.loaded.move_to_end(name)
+                return self.loaded[name]
+            if name not in self.loaders:
+                raise KeyError(f"Unknown model '{name}', registered models: {', '.join(self.loaders)}.")
+            loading_lock = self.loading_locks[name]
+
+        with loading_lock:
+            with self.lock:
+                # Loaded by another thread while this one waited
+                if name in self.loaded:
+                    self.loaded.move_to_end(name)
+                    return self.loaded[name]
+                # Make room for a model whose size is known from an earlier load
+                evicted = self._enforce_budget(incoming=self.stats[name]['memory_bytes'] or 0)
+                loader = self.loaders[name]
+            if evicted:
+                gc.collect()
+
+            rss_before = current_rss()
+            start_time = time.perf_counter()
+            model = loader()
+            load_seconds = time.perf_counter() - start_time
+            memory_bytes = max(current_rss() - rss_before, 0)
+
+            with self.lock:
+                stats = self.stats[name]
+                stats['load_seconds'] = load_seconds
+                stats['memory_bytes'] = memory_bytes
+                stats['loads'] += 1
+                self.loaded[name] = model
+                evicted = self._enforce_budget(keep=name)
+        if evicted:
+            gc.collect()
+        return model
+
+    def set(self, name, model):
+        """
+        Put an already loaded model in the registry, e.g. a replacement for tests or benchmarks.
+        """
+        with self.lock:
+            if name not in self.stats:
+                self.register(name, lambda: model)
+            self.loaded[name] = model
+            self.loaded.move_to_end(name)
+
+    def unload(self, name):
+        """
+        Drop a loaded model; it is loaded again on its next use.
+        """
+        with self.lock:
+            model = self.loaded.pop(name, None)
+        if model is not None:
+            del model
+            gc.collect()
+
+    def memory_in_use(self):
+        """
+        :return: Bytes taken by the loaded models, as measured when they were loaded.
+        """
+        with self.lock:
+            return sum(self.stats[name]['memory_bytes'] or 0 for name in self.loaded)
+
+    def _enforce_budget(self, incoming=0, keep=None):
+        # Called with the lock held; returns the evicted models' names, the caller collects the garbage
+        evicted = []
+        if self.budget_mb is None:
+            return evicted
+        budget = self.budget_mb * 2 ** 20
+        while self.memory_in_use() + incoming > budget:
+            victims = [name for name in self.loaded if name != keep]
+            if not victims:
+                break
+            victim = victims[0]
+            del self.loaded[victim]
+            self.stats[victim]['evictions'] += 1
+            evicted.append(victim)
+            print(f"Model memory budget of {self.budget_mb:.0f} MB exceeded, evicted '{victim}'.")
+        if keep is not None and self.memory_in_use() > budget:
+            print(f"Model '{keep}' alone exceeds the memory budget of {self.budget_mb:.0f} MB.")
+        return evicted
+
+    def report(self):
+        """
+        :return: List with the load time, memory and load/eviction counts of every registered model.
+        """
+        with self.lock:
+            return [{'model': name,
+                     'description': self.descriptions[name],
+                     'loaded': name in self.loaded,
+                     'load_seconds': None if stats['load_seconds'] is None else round(stats['load_seconds'], 3),
+                     'memory_mb': None if stats['memory_bytes'] is None else round(stats['memory_bytes'] / 2 ** 20, 1),
+                     'loads': stats['loads'],
+                     'evictions': stats['evictions']}
+                    for name, stats in self.stats.items()]
+
+    def print_report(self):
+        print(f"{'model':<12} {'loaded':<7} {'load s':>8} {'MB':>8} {'loads':>6} {'evicted':>8}")
+        for entry in self.report():
+            load_seconds = '' if entry['load_seconds'] is None else f"{entry['load_seconds']:.2f}"
+            memory_mb = '' if entry['memory_mb'] is None else f"{entry['memory_mb']:.1f}"
+            print(f"{entry['model']:<12} {'yes' if entry['loaded'] else 'no':<7} {load_seconds:>8} {memory_mb:>8} "
+                  f"{entry['loads']:>6} {entry['evictions']:>8}")
+        if self.budget_mb is not None:
+            print(f"In use: {self.memory_in_use() / 2 ** 20:.1f} MB of {self.budget_mb:.0f} MB")
+
+
+def load_spacy():
+    import spacy
+    return spacy.load(SPACY_MODEL)
+
+
+def load_bertje_mlm():
+    # Tokenizer and model, with the inference backend selected at startup
+    from inferenceBackend import load_mask_model
+    return load_mask_model(MLM_MODEL)
+
+
+def load_simcse():
+    from inferenceBackend import load_sentence_model
+    return load_sentence_model(SIMCSE_MODEL)
+
+
+def load_robbert():
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+    return (AutoTokenizer.from_pretrained(SIMILARITY_MODEL),
+            AutoModelForSequenceClassification.from_pretrained(SIMILARITY_MODEL))
+
+
+registry = ModelRegistry(DEFAULT_BUDGET_MB)
+registry.register('spacy', load_spacy, SPACY_MODEL)
+registry.register('bertje_mlm', load_bertje_mlm, MLM_MODEL)
+registry.register('simcse', load_simcse, SIMCSE_MODEL)
+registry.register('robbert', load_robbert, SIMILARITY_MODEL)
+
+
+def get_model(name):
+    """
+    :param name: 'spacy', 'bertje_mlm', 'simcse' or 'robbert'.
+    :return: The model from the shared registry, loaded on first use.
+    """
+    return registry.get(name)
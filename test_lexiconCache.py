@@ -0,0 +1,49 @@
+import os
+import sqlite3
+
+from lexiconCache import Lexicon
+
+
+def build_database(db_path, words, synonyms):
+    """
+    Build a synonym database next to db_path and move it in place, like a rebuild of the lexicon.
+
+    :param words: Dictionary word -> simplicity score.
+    :param synonyms: List of (word, synonym, relatedness score) tuples.
+    """
+    temp_path = db_path + '.tmp'
+    conn = sqlite3.connect(temp_path)
+    conn.execute('CREATE TABLE words (word TEXT PRIMARY KEY, word_type TEXT, simplicity_score REAL)')
+    conn.execute('CREATE TABLE synonyms (word TEXT, synonym TEXT, relatedness_score REAL)')
+    conn.executemany('INSERT INTO words (word, simplicity_score) VALUES (?, ?)', words.items())
+    conn.executemany('INSERT INTO synonyms VALUES (?, ?, ?)', synonyms)
+    conn.commit()
+    conn.close()
+    os.replace(temp_path, db_path)
+
+
+def test_rebuilt_database_is_served(tmp_path):
+    db_path = str(tmp_path / 'synonyms.db')
+    build_database(db_path, {'woning': 7.0, 'huis': 9.0}, [('woning', 'huis', 0.5)])
+    lexicon = Lexicon(db_path, check_interval=0)
+    assert lexicon.simplicity_score('woning') == 7.0
+    assert lexicon.synonyms('woning') == [('huis', 9.0, 0.5)]
+
+    build_database(db_path, {'woning': 99.0, 'huis': 9.0, 'pand': 3.0},
+                   [('woning', 'huis', 0.8), ('woning', 'pand', 0.4)])
+    assert lexicon.simplicity_score('woning') == 99.0
+    assert lexicon.synonyms('woning') == [('huis', 9.0, 0.8), ('pand', 3.0, 0.4)]
+    assert 'pand' in lexicon
+
+
+def test_invalidate_serves_rebuilt_database(tmp_path):
+    db_path = str(tmp_path / 'synonyms.db')
+    build_database(db_path, {'woning': 7.0}, [])
+    # The file is not checked again within the hour, only invalidate() triggers the reload
+    lexicon = Lexicon(db_path, check_interval=3600)
+    assert lexicon.simplicity_score('woning') == 7.0
+
+    build_database(db_path, {'woning': 99.0}, [])
+    assert lexicon.simplicity_score('woning') == 7.0
+    lexicon.invalidate()
+    assert lexicon.simplicity_score('woning') == 99.0